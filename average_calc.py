@@ -1,58 +1,211 @@
 #!/usr/bin/env python3
 
 import os
+import time
+import argparse
+import uuid
+import redis
 import psycopg2
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
 
+from redis_conf.rollup_util import close_stale
+from partitions import (
+    is_partitioned,
+    create_upcoming_partitions,
+    drop_expired_partitions,
+)
+
 load_dotenv()
 DBHOST = os.getenv("DBHOST")
 DBUSER = os.getenv("DBUSER")
 DBNAME = os.getenv("DBNAME")
 DBPASSWORD = os.getenv("DBPASSWORD")
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
 
-conn = psycopg2.connect(dbname=DBNAME, user=DBUSER, password=DBPASSWORD, host=DBHOST)
-
+# Hourly rollups behind /devices/data/history and the export, the default keeps the
+# API's 7-day window (the oldest day is only partly inside it)
+HISTORICAL_RETENTION_DAYS = int(os.getenv("HISTORICAL_RETENTION_DAYS", 8))
+DAILY_AVERAGES_RETENTION_DAYS = int(os.getenv("DAILY_AVERAGES_RETENTION_DAYS", 7))
+PRUNE_BATCH_SIZE = int(os.getenv("PRUNE_BATCH_SIZE", 10000))
 
-def calculate_daily_averages_and_prune():
-    cur = conn.cursor()
 
+def finalize_daily_averages(cur, day: date):
+    """
+    Stores the averages of the given day from the running aggregates kept on ingest.
+    Rerunning for the same day recomputes the same values.
+    """
     cur.execute(
-        "SELECT DISTINCT device_id FROM historical_data WHERE temp IS NOT NULL AND soil_hum IS NOT NULL AND air_hum IS NOT NULL AND light IS NOT NULL"
+        """
+        UPDATE daily_averages
+        SET avg_temp = sum_temp / sample_count, avg_soil_hum = sum_soil_hum / sample_count,
+            avg_air_hum = sum_air_hum / sample_count, avg_light = sum_light / sample_count
+        WHERE date = %s AND sample_count > 0
+    """,
+        (day,),
     )
-    device_ids = [row[0] for row in cur.fetchall()]
+    return cur.rowcount
 
-    for device_id in device_ids:
-        one_day_ago = datetime.now() - timedelta(days=1)
+
+def prune_in_batches(conn, table: str, key: str, column: str, cutoff):
+    """
+    Deletes rows of table with column older than cutoff, PRUNE_BATCH_SIZE rows per transaction.
+    """
+    deleted = 0
+    cur = conn.cursor()
+
+    while True:
         cur.execute(
-            """
-            SELECT AVG(temp) as avg_temp, AVG(soil_hum) as avg_soil_hum, 
-                   AVG(air_hum) as avg_air_hum, AVG(light) as avg_light
-            FROM historical_data
-            WHERE device_id = %s AND created_at >= %s
+            f"""
+            DELETE FROM {table} WHERE {key} IN (
+                SELECT {key} FROM {table} WHERE {column} < %s LIMIT %s
+            )
         """,
-            (device_id, one_day_ago),
+            (cutoff, PRUNE_BATCH_SIZE),
         )
+        conn.commit()
+        deleted += cur.rowcount
 
-        result = cur.fetchone()
+        if cur.rowcount < PRUNE_BATCH_SIZE:
+            break
+
+    cur.close()
+    return deleted
 
-        if result:
-            cur.execute(
-                """
-                INSERT INTO daily_averages (device_id, avg_temp, avg_soil_hum, avg_air_hum, avg_light, date)
-                VALUES (%s, %s, %s, %s, %s, CURRENT_DATE)
-            """,
-                (device_id, result[0], result[1], result[2], result[3]),
-            )
 
-    seven_days_ago = (datetime.now() - timedelta(days=7)).date()
+def prune(conn, table: str, key: str, column: str, cutoff: date):
+    """
+    Drops whole expired partitions of partitioned tables, rows left in the default
+    partition and in plain tables are deleted in batches.
+    Returns the number of dropped partitions and deleted rows.
+    """
+    cur = conn.cursor()
+    partitioned = is_partitioned(cur, table)
+    cur.close()
+
+    if not partitioned:
+        return 0, prune_in_batches(conn, table, key, column, cutoff)
+
+    dropped = drop_expired_partitions(conn, table, cutoff)
+    deleted = prune_in_batches(conn, f"{table}_default", key, column, cutoff)
+    return dropped, deleted
+
+
+def flush_stale_rollups(conn):
+    """
+    Writes hourly rollups of devices that stopped sending readings, their accumulators
+    are otherwise only closed by the next reading (redis_conf/rollup_util.py).
+    """
+    redis_client = redis.Redis.from_url(REDIS_URL)
+    rollups = close_stale(
+        redis_client, datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    )
+    redis_client.close()
+
+    if rollups:
+        columns = list(rollups[0])
+        cur = conn.cursor()
+        # Rollups of devices deleted meanwhile are skipped instead of failing the run
+        cur.executemany(
+            f"INSERT INTO historical_data ({', '.join(columns)}) "
+            f"SELECT {', '.join(f'%({column})s' for column in columns)} "
+            "WHERE EXISTS (SELECT 1 FROM devices WHERE device_id = %(device_id)s)",
+            rollups,
+        )
+        conn.commit()
+        cur.close()
 
-    cur.execute("DELETE FROM historical_data")
-    cur.execute("DELETE FROM daily_averages WHERE date < %s", (seven_days_ago,))
+    return len(rollups)
 
+
+def bump_history_versions(conn):
+    """
+    Invalidates data and history ETags of every device (redis_conf/version_util.py).
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT device_id FROM devices")
+    device_ids = [row[0] for row in cur.fetchall()]
+    cur.close()
+
+    redis_client = redis.Redis.from_url(REDIS_URL)
+    pipe = redis_client.pipeline(transaction=False)
+    for device_id in device_ids:
+        pipe.set(f"device_version:data:{device_id}", uuid.uuid4().hex)
+    pipe.execute()
+    redis_client.close()
+
+    return len(device_ids)
+
+
+def calculate_daily_averages_and_prune(conn, day: date):
+    timings = {}
+
+    started = time.perf_counter()
+    rollups = flush_stale_rollups(conn)
+    timings["rollups"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cur = conn.cursor()
+    devices = finalize_daily_averages(cur, day)
     conn.commit()
     cur.close()
+    timings["averages"] = time.perf_counter() - started
 
+    started = time.perf_counter()
+    created_partitions = create_upcoming_partitions(conn, day)
+    timings["create_partitions"] = time.perf_counter() - started
 
-calculate_daily_averages_and_prune()
-conn.close()
+    started = time.perf_counter()
+    historical_cutoff = day + timedelta(days=1 - HISTORICAL_RETENTION_DAYS)
+    dropped_historical, pruned_historical = prune(
+        conn, "historical_data", "historical_data_id", "created_at", historical_cutoff
+    )
+    timings["prune_historical_data"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    averages_cutoff = day - timedelta(days=DAILY_AVERAGES_RETENTION_DAYS)
+    dropped_averages, pruned_averages = prune(
+        conn, "daily_averages", "daily_averages_id", "date", averages_cutoff
+    )
+    timings["prune_daily_averages"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    invalidated = bump_history_versions(conn)
+    timings["invalidate_etags"] = time.perf_counter() - started
+
+    print(f"rollups: {rollups} hours in {timings['rollups']:.3f}s")
+    print(f"averages: {devices} devices in {timings['averages']:.3f}s")
+    print(
+        f"create_partitions: {created_partitions} partitions "
+        f"in {timings['create_partitions']:.3f}s"
+    )
+    print(
+        f"prune_historical_data: {dropped_historical} partitions, "
+        f"{pruned_historical} rows in {timings['prune_historical_data']:.3f}s"
+    )
+    print(
+        f"prune_daily_averages: {dropped_averages} partitions, "
+        f"{pruned_averages} rows in {timings['prune_daily_averages']:.3f}s"
+    )
+    print(
+        f"invalidate_etags: {invalidated} devices "
+        f"in {timings['invalidate_etags']:.3f}s"
+    )
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--date",
+        type=date.fromisoformat,
+        default=datetime.utcnow().date(),
+        help="Day to finalize, YYYY-MM-DD (default: today, UTC)",
+    )
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        dbname=DBNAME, user=DBUSER, password=DBPASSWORD, host=DBHOST
+    )
+    calculate_daily_averages_and_prune(conn, args.date)
+    conn.close()
@@ -0,0 +1,68 @@
+import os
+import json
+import subprocess
+from datetime import datetime
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples: List[float], fraction: float):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples: List[float], elapsed: float):
+    """
+    Summary of latency samples in seconds, reported in milliseconds.
+    """
+    return {
+        "count": len(samples),
+        "rps": len(samples) / elapsed if elapsed else None,
+        "p50_ms": _ms(percentile(samples, 0.50)),
+        "p95_ms": _ms(percentile(samples, 0.95)),
+        "p99_ms": _ms(percentile(samples, 0.99)),
+        "max_ms": _ms(max(samples) if samples else None),
+    }
+
+
+def _ms(value):
+    return round(value * 1000, 3) if value is not None else None
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(path: str, mode: str, config: dict, results: Dict[str, dict]):
+    """
+    Writes results as JSON tagged with the commit, so runs can be compared across commits.
+    """
+    document = {
+        "mode": mode,
+        "commit": git_commit(),
+        "created_at": datetime.utcnow().isoformat(),
+        "config": config,
+        "results": results,
+    }
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
+
+
+def print_results(results: Dict[str, dict]):
+    print(f"{'name':<40}{'count':>9}{'rps':>11}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, stats in results.items():
+        rps = f"{stats['rps']:.1f}" if stats["rps"] is not None else "-"
+        print(
+            f"{name:<40}{stats['count']:>9}{rps:>11}"
+            f"{stats['p50_ms'] or 0:>10}{stats['p95_ms'] or 0:>10}"
+            f"{stats['p99_ms'] or 0:>10}"
+        )
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Load test for the microservice. Boots main:app with uvicorn (or targets --base-url),
+seeds devices and drives a weighted mix of ingest, task polling, history reads and
+token requests, reporting requests per second and p50/p95/p99 latency per route.
+
+Needs the Postgres database from DATABASE_URL_ASYNC and the Redis server from REDIS_URL.
+
+    python -m benchmarks.load_test --devices 200 --concurrency 50 --duration 30
+"""
+
+import os
+import sys
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+import httpx
+from collections import defaultdict
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.base import Base
+from models.device import Device
+
+# Imported for create_all
+from models import data, daily_average, historical_data, job, task  # noqa: F401
+
+from dependencies import engine
+from redis_conf.redis_conn import redis_pool
+from redis_conf.device_registry import device_registry
+
+from benchmarks.common import ROOT, summarize, save_results, print_results
+
+DEVICE_PREFIX = "bench-"
+
+# Route -> weight in the traffic mix
+TRAFFIC_MIX = {
+    "POST /devices/data": 60,
+    "GET /devices/tasks": 25,
+    "GET /devices/data/history": 10,
+    "POST /request_token": 5,
+}
+
+
+async def seed_devices(count: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for table in ("historical_data", "daily_averages"):
+            await conn.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {table}_default "
+                    f"PARTITION OF {table} DEFAULT"
+                )
+            )
+        await conn.execute(
+            insert(Device)
+            .values([{"device_id": f"{DEVICE_PREFIX}{i}"} for i in range(count)])
+            .on_conflict_do_nothing()
+        )
+    await engine.dispose()
+
+    # Seeded straight into Postgres, a registry filled earlier would not know them
+    device_ids = [f"{DEVICE_PREFIX}{i}" for i in range(count)]
+    for device_id in device_ids:
+        await device_registry.add(device_id)
+    await redis_pool.disconnect()
+    return device_ids
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int):
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        # The virtual devices share one IP and post in tight loops, which is what
+        # throttling exists to stop, so the server under test runs without it
+        env=dict(os.environ, THROTTLE_ENABLED="false"),
+    )
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + "/").status_code == 200:
+                return process, base_url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError("Server did not start within 30 seconds")
+
+
+def random_reading():
+    return {
+        "temp": round(random.uniform(10.0, 35.0), 2),
+        "soil_hum": round(random.uniform(0.0, 66000.0), 2),
+        "air_hum": round(random.uniform(20.0, 90.0), 2),
+        "light": round(random.uniform(0.0, 51000.0), 2),
+    }
+
+
+async def request_token(client: httpx.AsyncClient, device_id: str):
+    response = await client.post("/request_token", json={"device_id": device_id})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def virtual_device(client, device_id, deadline, latencies, errors):
+    token = await request_token(client, device_id)
+    routes = list(TRAFFIC_MIX)
+    weights = list(TRAFFIC_MIX.values())
+
+    while time.monotonic() < deadline:
+        route = random.choices(routes, weights)[0]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        started = time.perf_counter()
+        try:
+            if route == "POST /devices/data":
+                response = await client.post(
+                    "/devices/data", json=random_reading(), headers=headers
+                )
+            elif route == "GET /devices/tasks":
+                response = await client.get("/devices/tasks", headers=headers)
+            elif route == "GET /devices/data/history":
+                response = await client.get("/devices/data/history", headers=headers)
+            else:
+                response = await client.post(
+                    "/request_token", json={"device_id": device_id}
+                )
+                if response.status_code == 200:
+                    token = response.json()["access_token"]
+        except httpx.HTTPError:
+            errors[route] += 1
+            continue
+
+        latencies[route].append(time.perf_counter() - started)
+        # 404 is the normal answer for devices without tasks or history
+        if response.status_code >= 500 or response.status_code in (401, 429):
+            errors[route] += 1
+
+
+async def run_load(base_url, device_ids, concurrency, duration):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=30
+    ) as client:
+        deadline = time.monotonic() + duration
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                virtual_device(
+                    client, device_ids[i % len(device_ids)], deadline, latencies, errors
+                )
+                for i in range(concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+    results = {}
+    for route, samples in latencies.items():
+        results[route] = dict(summarize(samples, elapsed), errors=errors[route])
+    results["total"] = dict(
+        summarize([s for samples in latencies.values() for s in samples], elapsed),
+        errors=sum(errors.values()),
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--base-url", help="Target a running server instead")
+    parser.add_argument("--output", default="bench_output.json")
+    args = parser.parse_args()
+
+    device_ids = asyncio.run(seed_devices(args.devices))
+
+    process = None
+    base_url = args.base_url
+    if base_url is None:
+        process, base_url = start_server(free_port(), args.workers)
+
+    try:
+        results = asyncio.run(
+            run_load(base_url, device_ids, args.concurrency, args.duration)
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print_results(results)
+    save_results(args.output, "load", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
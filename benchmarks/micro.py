@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of per-request hot spots: get_device_id (token decode and cache hit),
+DataUpdate validation and response serialization. get_device_id needs the Redis
+server from REDIS_URL for its rate limiter lookups.
+
+    python -m benchmarks.micro --iterations 20000
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import orjson
+from datetime import date, timedelta
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.security import HTTPAuthorizationCredentials
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.security import create_device_token, get_device_id, token_cache
+from schemas.data import DataUpdate
+
+from benchmarks.common import summarize, save_results, print_results
+
+READING = {"temp": 21.5, "soil_hum": 3400.0, "air_hum": 45.0, "light": 1200.0}
+HISTORY_ROWS = [
+    {
+        "daily_averages_id": i,
+        "avg_temp": 21.5,
+        "avg_soil_hum": 3400.0,
+        "avg_air_hum": 45.0,
+        "avg_light": 1200.0,
+        "date": date.today() - timedelta(days=i),
+    }
+    for i in range(7)
+]
+
+
+def time_sync(function, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def time_async(function, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await function()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def bench_get_device_id(iterations: int):
+    request = Request({"type": "http", "client": ("127.0.0.1", 0), "headers": []})
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer",
+        credentials=create_device_token(
+            data={"sub": "bench-device"}, expires_delta=timedelta(minutes=15)
+        ),
+    )
+
+    async def decode():
+        token_cache._entries.clear()
+        await get_device_id(request, credentials)
+
+    async def cached():
+        await get_device_id(request, credentials)
+
+    return {
+        "get_device_id (decode)": await time_async(decode, iterations),
+        "get_device_id (cache hit)": await time_async(cached, iterations),
+    }
+
+
+def bench_validation(iterations: int):
+    return {
+        "DataUpdate validation": time_sync(lambda: DataUpdate(**READING), iterations)
+    }
+
+
+def bench_serialization(iterations: int):
+    return {
+        "history jsonable_encoder + json": time_sync(
+            lambda: orjson.dumps(jsonable_encoder(HISTORY_ROWS)), iterations
+        ),
+        "history orjson": time_sync(lambda: orjson.dumps(HISTORY_ROWS), iterations),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--output", default="bench_output.json")
+    args = parser.parse_args()
+
+    samples = {}
+    samples.update(asyncio.run(bench_get_device_id(args.iterations)))
+    samples.update(bench_validation(args.iterations))
+    samples.update(bench_serialization(args.iterations))
+
+    results = {
+        name: summarize(values, sum(values)) for name, values in samples.items()
+    }
+    print_results(results)
+    save_results(args.output, "micro", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Query plan check. Seeds a dataset, runs EXPLAIN on the hot queries of the routers and
+exits with status 1 if any of them scans a table sequentially. Everything runs in one
+transaction that is rolled back, the seed data is never committed.
+
+Needs the Postgres database from DATABASE_URL_ASYNC with the schema from
+`alembic upgrade head`.
+
+    python -m benchmarks.query_plans --devices 500
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ingest import upsert_data, aggregate_rows, increment_daily_aggregates
+from core.queries import (
+    device_data_query,
+    daily_history_query,
+    pending_tasks_query,
+    device_task_query,
+)
+from core.history import history_buckets
+from core.export import export_query
+from core.jobs import claim_job_query
+
+from dependencies import engine
+
+DEVICE_PREFIX = "plan-"
+SEEDED_TABLES = (
+    "devices",
+    "data",
+    "tasks",
+    "historical_data",
+    "daily_averages",
+    "jobs",
+)
+
+SEED_STATEMENTS = [
+    """
+    INSERT INTO devices (device_id, created_at, updated_at)
+    SELECT CAST(:prefix AS text) || i, now(), now() FROM generate_series(1, :devices) i
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO data (device_id, temp, soil_hum, air_hum, light, created_at, updated_at)
+    SELECT CAST(:prefix AS text) || i, 21.5, 3400, 45, 1200, now(), now()
+    FROM generate_series(1, :devices) i
+    ON CONFLICT DO NOTHING
+    """,
+    # Mostly finished tasks, one pending task per device
+    """
+    INSERT INTO tasks (device_id, task_number, status, created_at, updated_at)
+    SELECT CAST(:prefix AS text) || i, 2, CASE WHEN t = 1 THEN 0 ELSE 1 END, now(), now()
+    FROM generate_series(1, :devices) i, generate_series(1, 20) t
+    """,
+    """
+    INSERT INTO historical_data (device_id, temp, soil_hum, air_hum, light,
+        sample_count, created_at)
+    SELECT CAST(:prefix AS text) || i, 21.5, 3400, 45, 1200, 60,
+        date_trunc('hour', now() AT TIME ZONE 'utc') - h * interval '1 hour'
+    FROM generate_series(1, :devices) i, generate_series(1, 48) h
+    """,
+    """
+    INSERT INTO daily_averages (device_id, date, sample_count, sum_temp, sum_soil_hum,
+        sum_air_hum, sum_light)
+    SELECT CAST(:prefix AS text) || i, current_date - d, 1440, 30960, 4896000, 64800, 1728000
+    FROM generate_series(0, 6) d, generate_series(1, :devices) i
+    ON CONFLICT DO NOTHING
+    """,
+    # Held deletion jobs and retries waiting for their backoff, a few due ones
+    """
+    INSERT INTO jobs (kind, payload, attempts, available_at, created_at)
+    SELECT 'delete_device', json_build_object('device_id', CAST(:prefix AS text) || i),
+        0,
+        CASE
+            WHEN i % 100 = 0 THEN now() AT TIME ZONE 'utc'
+            WHEN i % 2 = 0 THEN now() AT TIME ZONE 'utc' + interval '1 hour'
+        END,
+        now() AT TIME ZONE 'utc'
+    FROM generate_series(1, :devices * 10) i
+    """,
+]
+
+
+def hot_queries(device_id: str):
+    """
+    The statements the routers and workers run per request or job, by route.
+    """
+    now = datetime.utcnow()
+    reading = {
+        "device_id": device_id,
+        "temp": 21.5,
+        "soil_hum": 3400.0,
+        "air_hum": 45.0,
+        "light": 1200.0,
+        "updated_at": now,
+    }
+    return {
+        "GET /devices/data": device_data_query(device_id),
+        "GET /devices/data/history": daily_history_query(device_id),
+        "GET /devices/data/history?resolution": history_buckets(
+            device_id, now - timedelta(days=1), now, 3600, 1000
+        ),
+        "GET /devices/data/export": export_query(
+            "history", device_id, now - timedelta(days=1), now
+        ),
+        "GET /devices/tasks": pending_tasks_query(device_id),
+        "PUT /devices/tasks/update": device_task_query(device_id, 1),
+        "POST /devices/data (data)": upsert_data([reading]),
+        "POST /devices/data/batch (data)": upsert_data([reading], only_newer=True),
+        "POST /devices/data (daily_averages)": increment_daily_aggregates(
+            aggregate_rows([reading])
+        ),
+        "job worker claim": claim_job_query(now),
+    }
+
+
+def seq_scans(plan: dict):
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child)
+
+
+async def explain(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def check_plans(devices: int, seed: bool):
+    failures = {}
+    async with engine.connect() as conn:
+        # Seed, statistics and plans share one transaction that is rolled back, the
+        # database is left as it was
+        transaction = await conn.begin()
+        try:
+            if seed:
+                for statement in SEED_STATEMENTS:
+                    await conn.execute(
+                        text(statement), {"prefix": DEVICE_PREFIX, "devices": devices}
+                    )
+                for table in SEEDED_TABLES:
+                    await conn.execute(text(f"ANALYZE {table}"))
+
+            for route, stmt in hot_queries(f"{DEVICE_PREFIX}{devices // 2}").items():
+                scanned = sorted(set(seq_scans(await explain(conn, stmt))))
+                if scanned:
+                    failures[route] = scanned
+                    print(f"{route}: Seq Scan on {', '.join(scanned)}")
+                else:
+                    print(f"{route}: ok")
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument(
+        "--no-seed", action="store_true", help="Check plans on the existing data"
+    )
+    args = parser.parse_args()
+
+    failures = asyncio.run(check_plans(args.devices, not args.no_seed))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import time
+import asyncio
+import httpx
+from typing import Optional
+
+from core.settings import Settings
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class BackendClient:
+    """
+    Shared async HTTP client for the Ruby backend with keep-alive pooling, timeouts,
+    bounded retries and a circuit breaker that fails fast after repeated failures.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float,
+        retries: int,
+        max_connections: int,
+        failure_threshold: int,
+        reset_timeout: float,
+    ):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.max_connections = max_connections
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        # Set while the single trial request of a half-open circuit is in flight
+        self._probing = False
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def start(self):
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            headers={"Content-Type": "application/json"},
+        )
+
+    async def stop(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def _check_circuit(self):
+        """
+        Returns True when the request is the trial request of a half-open circuit.
+        """
+        if self._opened_at is None:
+            return False
+
+        # After reset_timeout one trial request is let through (half-open), the others
+        # keep failing fast until it succeeds or fails
+        if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+            raise CircuitOpenError("Backend circuit is open")
+        self._probing = True
+        return True
+
+    def _record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def _record_failure(self):
+        self._failures += 1
+        self._probing = False
+        if self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+    async def request(self, method: str, path: str, **kwargs):
+        """
+        Sends a request to the backend. Idempotent GET requests are retried on transport
+        errors and 5xx responses, other methods only when the connection failed.
+        """
+        probe = self._check_circuit()
+        try:
+            return await self._send(method, path, **kwargs)
+        finally:
+            # A trial request that ended without a verdict (e.g. cancelled) reopens
+            if probe and self._probing:
+                self._probing = False
+                self._opened_at = time.monotonic()
+
+    async def _send(self, method: str, path: str, **kwargs):
+        idempotent = method.upper() == "GET"
+        response = None
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self._client.request(method, path, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                if attempt == self.retries:
+                    self._record_failure()
+                    raise
+            except httpx.TransportError:
+                if not idempotent or attempt == self.retries:
+                    self._record_failure()
+                    raise
+            else:
+                if response.status_code < 500:
+                    self._record_success()
+                    return response
+                if not idempotent or attempt == self.retries:
+                    break
+
+            await asyncio.sleep(0.1 * 2**attempt)
+
+        self._record_failure()
+        return response
+
+
+backend_client = BackendClient(
+    base_url=Settings.RUBY_BACKEND_URL,
+    timeout=Settings.BACKEND_TIMEOUT_SECONDS,
+    retries=Settings.BACKEND_RETRIES,
+    max_connections=Settings.BACKEND_MAX_CONNECTIONS,
+    failure_threshold=Settings.BACKEND_CIRCUIT_FAILURES,
+    reset_timeout=Settings.BACKEND_CIRCUIT_RESET_SECONDS,
+)
@@ -0,0 +1,100 @@
+import struct
+import msgpack
+from typing import Callable
+from fastapi import Request
+from fastapi.routing import APIRoute
+
+from core.sensors import SENSORS
+
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# Fixed little-endian records: temp, soil_hum, air_hum, light as float32 and an
+# optional uint32 unix timestamp, 0 meaning "now"
+READING_CONTENT_TYPE = "application/vnd.greenmind.reading"
+READING = struct.Struct("<4f")
+READING_WITH_TIMESTAMP = struct.Struct("<4fI")
+
+BINARY_CONTENT_TYPES = MSGPACK_CONTENT_TYPES + (READING_CONTENT_TYPE,)
+
+
+def _reading(values):
+    reading = dict(zip(SENSORS, values))
+    if len(values) > 4 and values[4]:
+        reading["timestamp"] = values[4]
+    return reading
+
+
+def decode_struct(body: bytes, many: bool):
+    """
+    Decodes one record (16 or 20 bytes) or, with many, 20 byte records in one pass.
+    """
+    if many:
+        if len(body) % READING_WITH_TIMESTAMP.size:
+            raise ValueError("Body is not a whole number of records")
+        return [
+            _reading(values) for values in READING_WITH_TIMESTAMP.iter_unpack(body)
+        ]
+
+    if len(body) == READING.size:
+        return _reading(READING.unpack(body))
+    if len(body) == READING_WITH_TIMESTAMP.size:
+        return _reading(READING_WITH_TIMESTAMP.unpack(body))
+    raise ValueError("Body is not a single record")
+
+
+def decode_body(content_type: str, body: bytes, many: bool):
+    if content_type in MSGPACK_CONTENT_TYPES:
+        return msgpack.unpackb(body)
+    return decode_struct(body, many)
+
+
+class BinaryReadingRequest(Request):
+    """
+    Request whose binary body is decoded into the same structure a JSON body has, so
+    FastAPI validates it with the route's usual models.
+    """
+
+    def __init__(self, scope, receive, content_type: str, many: bool):
+        super().__init__(scope, receive)
+        self.binary_content_type = content_type
+        self.many = many
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = decode_body(
+                self.binary_content_type, await self.body(), self.many
+            )
+        return self._json
+
+
+class ReadingRoute(APIRoute):
+    """
+    Route accepting MessagePack and fixed struct bodies besides JSON.
+    Routes ending with /batch take a list of readings.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        many = self.path.endswith("/batch")
+
+        async def route_handler(request: Request):
+            content_type = request.headers.get("content-type", "")
+            content_type = content_type.split(";")[0].strip().lower()
+
+            if content_type in BINARY_CONTENT_TYPES:
+                headers = [
+                    (key, value)
+                    for key, value in request.scope["headers"]
+                    if key != b"content-type"
+                ]
+                headers.append((b"content-type", b"application/json"))
+                request = BinaryReadingRequest(
+                    dict(request.scope, headers=headers),
+                    request.receive,
+                    content_type,
+                    many,
+                )
+
+            return await handler(request)
+
+        return route_handler
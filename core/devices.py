@@ -0,0 +1,17 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models.device import Device
+from redis_conf.device_registry import device_registry
+
+
+async def device_exists(db: AsyncSession, device_id: str):
+    """
+    Checks the device registry, the database is only read to fill it the first time.
+    """
+
+    async def load_device_ids():
+        result = await db.execute(select(Device.device_id))
+        return result.scalars().all()
+
+    return await device_registry.exists(device_id, load_device_ids)
@@ -0,0 +1,91 @@
+import csv
+import io
+import zlib
+import orjson
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from sqlalchemy.future import select
+
+from models.historical_data import HistoricalData
+from models.daily_average import DailyAverages
+from core.sensors import SENSORS
+from core.ingest import daily_average
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def export_query(
+    table: str, device_id: str, start: Optional[datetime], end: Optional[datetime]
+):
+    """
+    SELECT of a device's historical_data ("history") or daily_averages ("daily") rows
+    in [start, end), oldest first.
+    """
+    if table == "daily":
+        columns = [DailyAverages.date, DailyAverages.sample_count]
+        for sensor in SENSORS:
+            columns += [
+                daily_average(sensor),
+                getattr(DailyAverages, f"min_{sensor}"),
+                getattr(DailyAverages, f"max_{sensor}"),
+            ]
+        time_column = DailyAverages.date
+        device_column = DailyAverages.device_id
+        start, end = start and start.date(), end and end.date()
+    else:
+        columns = [HistoricalData.created_at, HistoricalData.sample_count]
+        for sensor in SENSORS:
+            columns += [
+                getattr(HistoricalData, sensor),
+                getattr(HistoricalData, f"min_{sensor}"),
+                getattr(HistoricalData, f"max_{sensor}"),
+            ]
+        time_column = HistoricalData.created_at
+        device_column = HistoricalData.device_id
+
+    stmt = select(*columns).filter(device_column == device_id)
+    if start is not None:
+        stmt = stmt.filter(time_column >= start)
+    if end is not None:
+        stmt = stmt.filter(time_column < end)
+    return stmt.order_by(time_column)
+
+
+def encode_ndjson(rows: List[dict]):
+    return b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
+def encode_csv(rows: List[dict], header: bool):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    if header:
+        writer.writeheader()
+    writer.writerows(
+        {
+            key: value.isoformat() if hasattr(value, "isoformat") else value
+            for key, value in row.items()
+        }
+        for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+async def encode_chunks(
+    chunks: AsyncIterator[List[dict]], format: str
+) -> AsyncIterator[bytes]:
+    header = True
+    async for rows in chunks:
+        if format == "csv":
+            yield encode_csv(rows, header)
+            header = False
+        else:
+            yield encode_ndjson(rows)
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
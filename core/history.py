@@ -0,0 +1,82 @@
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from models.historical_data import HistoricalData
+from core.sensors import SENSORS
+
+# historical_data holds hourly rollups, finer buckets would only repeat them
+MIN_RESOLUTION = 3600
+
+
+def utc_naive(timestamp: Optional[datetime]):
+    # Stored timestamps are naive UTC
+    if timestamp is not None and timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def resolution_for(start: datetime, end: datetime, max_points: int):
+    """
+    Smallest whole-hour bucket width in seconds that fits the range into max_points.
+    """
+    seconds = (end - start).total_seconds()
+    hours = math.ceil(seconds / max_points / MIN_RESOLUTION)
+    return max(hours, 1) * MIN_RESOLUTION
+
+
+def bucket_start(bucket):
+    # extract(epoch ...) is numeric on newer PostgreSQL, so bucket may be a Decimal
+    return datetime(1970, 1, 1) + timedelta(seconds=float(bucket))
+
+
+def history_buckets(
+    device_id: str,
+    start: datetime,
+    end: datetime,
+    resolution: int,
+    limit: int,
+    after: Optional[datetime] = None,
+):
+    """
+    Builds a SELECT aggregating a device's rollups into buckets of resolution seconds,
+    weighted by sample_count. Keyset pagination: only buckets after the one starting
+    at after, at most limit + 1 rows so the caller can tell whether a next page exists.
+    Rows written before the rollups carry no sample_count or min/max and count as one
+    reading.
+    """
+    bucket = (
+        func.floor(func.extract("epoch", HistoricalData.created_at) / resolution)
+        * resolution
+    ).label("bucket")
+    weight = func.coalesce(HistoricalData.sample_count, 1)
+
+    columns = [bucket, func.sum(weight).label("sample_count")]
+    for sensor in SENSORS:
+        value = getattr(HistoricalData, sensor)
+        columns += [
+            (func.sum(value * weight) / func.sum(weight)).label(f"avg_{sensor}"),
+            func.min(
+                func.coalesce(getattr(HistoricalData, f"min_{sensor}"), value)
+            ).label(f"min_{sensor}"),
+            func.max(
+                func.coalesce(getattr(HistoricalData, f"max_{sensor}"), value)
+            ).label(f"max_{sensor}"),
+        ]
+
+    if after is not None:
+        start = max(start, after + timedelta(seconds=resolution))
+
+    return (
+        select(*columns)
+        .filter(
+            HistoricalData.device_id == device_id,
+            HistoricalData.created_at >= start,
+            HistoricalData.created_at < end,
+        )
+        .group_by(bucket)
+        .order_by(bucket)
+        .limit(limit + 1)
+    )
@@ -0,0 +1,121 @@
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
+
+from models.data import Data
+from models.daily_average import DailyAverages
+from core.sensors import SENSORS
+
+
+# Upsert current data for one or more devices in a single statement
+def upsert_data(rows: List[dict], only_newer: bool = False):
+    """
+    Builds INSERT ... ON CONFLICT (device_id) DO UPDATE for rows of device_id, temp,
+    soil_hum, air_hum, light and updated_at. With only_newer a stored row is kept if it
+    is more recent, for readings that were buffered on the device.
+    """
+    stmt = insert(Data).values(
+        [dict(row, created_at=row["updated_at"]) for row in rows]
+    )
+    excluded = stmt.excluded
+
+    return stmt.on_conflict_do_update(
+        index_elements=[Data.device_id],
+        set_={
+            "temp": excluded.temp,
+            "soil_hum": excluded.soil_hum,
+            "air_hum": excluded.air_hum,
+            "light": excluded.light,
+            "updated_at": excluded.updated_at,
+        },
+        where=(Data.updated_at <= excluded.updated_at) if only_newer else None,
+    )
+
+
+def period_of(updated_at: datetime, period: str):
+    if period == "hour":
+        return updated_at.replace(minute=0, second=0, microsecond=0)
+    return updated_at.date()
+
+
+# Running per-device aggregates of readings, per day ("date") or per "hour"
+def new_aggregate(row: dict, period: str = "date"):
+    aggregate = {
+        "device_id": row["device_id"],
+        period: period_of(row["updated_at"], period),
+        "sample_count": 1,
+    }
+    for sensor in SENSORS:
+        aggregate[f"sum_{sensor}"] = row[sensor]
+        aggregate[f"min_{sensor}"] = row[sensor]
+        aggregate[f"max_{sensor}"] = row[sensor]
+    return aggregate
+
+
+def merge_aggregate(aggregate: dict, other: dict):
+    aggregate["sample_count"] += other["sample_count"]
+    for sensor in SENSORS:
+        aggregate[f"sum_{sensor}"] += other[f"sum_{sensor}"]
+        aggregate[f"min_{sensor}"] = min(
+            aggregate[f"min_{sensor}"], other[f"min_{sensor}"]
+        )
+        aggregate[f"max_{sensor}"] = max(
+            aggregate[f"max_{sensor}"], other[f"max_{sensor}"]
+        )
+    return aggregate
+
+
+def aggregate_rows(rows: List[dict], period: str = "date"):
+    aggregates: Dict[tuple, dict] = {}
+    for row in rows:
+        aggregate = new_aggregate(row, period)
+        key = (aggregate["device_id"], aggregate[period])
+        if key in aggregates:
+            merge_aggregate(aggregates[key], aggregate)
+        else:
+            aggregates[key] = aggregate
+    return list(aggregates.values())
+
+
+def increment_daily_aggregates(aggregates: List[dict]):
+    """
+    Builds one INSERT ... ON CONFLICT (device_id, date) DO UPDATE statement adding the
+    aggregates to daily_averages. Each (device_id, date) may appear only once.
+    """
+    stmt = insert(DailyAverages).values(aggregates)
+    excluded = stmt.excluded
+
+    set_ = {
+        "sample_count": func.coalesce(DailyAverages.sample_count, 0)
+        + excluded.sample_count
+    }
+    for sensor in SENSORS:
+        sum_column = getattr(DailyAverages, f"sum_{sensor}")
+        min_column = getattr(DailyAverages, f"min_{sensor}")
+        max_column = getattr(DailyAverages, f"max_{sensor}")
+
+        set_[f"sum_{sensor}"] = func.coalesce(sum_column, 0) + getattr(
+            excluded, f"sum_{sensor}"
+        )
+        set_[f"min_{sensor}"] = func.least(
+            min_column, getattr(excluded, f"min_{sensor}")
+        )
+        set_[f"max_{sensor}"] = func.greatest(
+            max_column, getattr(excluded, f"max_{sensor}")
+        )
+
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyAverages.device_id, DailyAverages.date], set_=set_
+    )
+
+
+# Average from running aggregates, falling back to the finalized value
+def daily_average(sensor: str):
+    sum_column = getattr(DailyAverages, f"sum_{sensor}")
+    avg_column = getattr(DailyAverages, f"avg_{sensor}")
+
+    return case(
+        (DailyAverages.sample_count > 0, sum_column / DailyAverages.sample_count),
+        else_=avg_column,
+    ).label(f"avg_{sensor}")
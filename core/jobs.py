@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+from models.job import Job
+
+from dependencies import async_session
+from core.settings import Settings
+
+from redis_conf.redis_conn import redis_client
+from redis_conf.notifier import Notifier
+
+logger = logging.getLogger(__name__)
+
+job_handlers: Dict[str, Callable[..., Awaitable]] = {}
+job_notifier = Notifier(redis_client, "jobs")
+
+
+# Register a coroutine handling jobs of the given kind
+def job_handler(kind: str):
+    def register(handler):
+        job_handlers[kind] = handler
+        return handler
+
+    return register
+
+
+def enqueue_job(db, kind: str, payload: dict, held: bool = False):
+    """
+    Adds a job to the session, it becomes durable with the caller's commit.
+    Call notify_workers() after committing to wake the workers up.
+    A held job has no available_at and only runs once release_jobs() picks it.
+    """
+    job = Job(kind=kind, payload=payload, attempts=0)
+    if held:
+        job.available_at = None
+    db.add(job)
+
+
+def held_jobs(kind: str, **payload):
+    """
+    Condition matching held jobs of the given kind whose payload has these values.
+    """
+    conditions = [Job.kind == kind, Job.available_at.is_(None)]
+    for key, value in payload.items():
+        conditions.append(Job.payload[key].as_string() == str(value))
+    return conditions
+
+
+async def release_jobs(db, kind: str, **payload):
+    """
+    Makes the matching held jobs available in the caller's transaction.
+    Returns how many were released.
+    """
+    result = await db.execute(
+        update(Job)
+        .where(*held_jobs(kind, **payload))
+        .values(available_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def notify_workers():
+    await job_notifier.publish("pending")
+
+
+def claim_job_query(now: datetime):
+    # Skips jobs other workers have locked, so they never wait on each other
+    return (
+        select(Job)
+        .filter(Job.available_at <= now)
+        .order_by(Job.job_id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+
+
+class JobWorker:
+    """
+    Runs jobs from the jobs table, claimed with SELECT ... FOR UPDATE SKIP LOCKED so any
+    number of workers can share the table. A job's handler runs in the same transaction
+    that deletes the job, either both commit or the job is retried with a backoff.
+    Workers sleep until notified, poll_interval is only a fallback for retries.
+    """
+
+    def __init__(self, session_factory, poll_interval: float):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._closing = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        with job_notifier.subscribe("pending") as notified:
+            while not self._closing:
+                notified.clear()
+
+                try:
+                    while await self.run_next():
+                        pass
+                except Exception:
+                    logger.exception("Job worker failed")
+
+                try:
+                    await asyncio.wait_for(notified.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_next(self):
+        """
+        Runs one available job. Returns False when there is nothing to run.
+        """
+        async with self.session_factory() as db:
+            result = await db.execute(claim_job_query(datetime.utcnow()))
+            job = result.scalars().first()
+
+            if job is None:
+                return False
+
+            job_id, kind, payload, attempts = (
+                job.job_id,
+                job.kind,
+                job.payload,
+                job.attempts or 0,
+            )
+
+            try:
+                await job_handlers[kind](db, payload)
+                await db.delete(job)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.exception("Job %s (%s) failed", job_id, kind)
+
+                backoff = min(timedelta(seconds=2**attempts), timedelta(hours=1))
+                await db.execute(
+                    update(Job)
+                    .where(Job.job_id == job_id)
+                    .values(
+                        attempts=attempts + 1,
+                        last_error=str(e),
+                        available_at=datetime.utcnow() + backoff,
+                    )
+                )
+                await db.commit()
+
+        return True
+
+
+job_worker = JobWorker(async_session, poll_interval=Settings.JOB_POLL_INTERVAL_SECONDS)
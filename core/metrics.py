@@ -0,0 +1,149 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.routing import Match
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being processed", ["method", "route"]
+)
+DB_STATEMENTS = Histogram(
+    "db_statements_per_request",
+    "SQL statements issued per request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 4, 5, 10, 20, 50, 100),
+)
+DB_TIME = Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL per request", ["route"]
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection"
+)
+REDIS_CALLS = Counter("redis_calls_total", "Redis calls", ["operation"])
+REDIS_LATENCY = Histogram(
+    "redis_call_duration_seconds", "Redis call latency", ["operation"]
+)
+REDIS_TIME = Histogram(
+    "redis_time_per_request_seconds", "Time spent in Redis per request", ["route"]
+)
+SENSOR_REJECTIONS = Counter(
+    "sensor_rejections_total", "Sensor values rejected as out of range", ["sensor"]
+)
+REQUESTS_THROTTLED = Counter(
+    "requests_throttled_total",
+    "Requests rejected by throttling",
+    ["route", "scope"],
+)
+TOKEN_CACHE_HITS = Gauge("token_cache_hits", "Verified token cache hits")
+TOKEN_CACHE_MISSES = Gauge("token_cache_misses", "Verified token cache misses")
+
+
+class RequestStats:
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self.redis_calls = 0
+        self.redis_time = 0.0
+        # Set by the profiling middleware to log every statement of the request
+        self.queries = None
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def route_template(request):
+    """
+    Path template of the matching route, keeps label cardinality bounded.
+    """
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Connection pool recording how long each checkout waited for a connection.
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            elapsed = time.perf_counter() - started
+            DB_POOL_WAIT.observe(elapsed)
+            stats = request_stats.get()
+            if stats is not None:
+                stats.pool_wait += elapsed
+
+
+def instrument_engine(engine):
+    """
+    Counts statements and SQL time of the current request through engine events.
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        context._started_at = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        stats = request_stats.get()
+        if stats is not None:
+            elapsed = time.perf_counter() - context._started_at
+            stats.statements += 1
+            stats.db_time += elapsed
+            if stats.queries is not None:
+                stats.queries.append((statement, elapsed))
+
+
+@contextmanager
+def redis_timer(operation: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        REDIS_CALLS.labels(operation).inc()
+        REDIS_LATENCY.labels(operation).observe(elapsed)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.redis_calls += 1
+            stats.redis_time += elapsed
+
+
+def observe_request(method: str, route: str, status: int, elapsed: float, stats):
+    REQUEST_LATENCY.labels(method, route, status).observe(elapsed)
+    DB_STATEMENTS.labels(route).observe(stats.statements)
+    DB_TIME.labels(route).observe(stats.db_time)
+    REDIS_TIME.labels(route).observe(stats.redis_time)
+
+
+def server_timing(stats, elapsed: float):
+    """
+    Server-Timing header value splitting the request into database, Redis and the rest.
+    """
+    app_time = max(elapsed - stats.db_time - stats.pool_wait - stats.redis_time, 0)
+    return (
+        f"db;dur={stats.db_time * 1000:.2f};desc=\"{stats.statements} statements\", "
+        f"pool;dur={stats.pool_wait * 1000:.2f}, "
+        f"redis;dur={stats.redis_time * 1000:.2f}, "
+        f"app;dur={app_time * 1000:.2f}"
+    )
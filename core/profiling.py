@@ -0,0 +1,131 @@
+import re
+import json
+import time
+import logging
+from collections import Counter
+from fastapi import Request, Response
+
+from core.settings import Settings
+from core.metrics import request_stats
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+N_PLUS_ONE_THRESHOLD = Settings.PROFILING_N_PLUS_ONE_THRESHOLD
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str):
+    """
+    Structural form of a statement, literal values and whitespace are collapsed.
+    """
+    statement = _literals.sub("?", statement)
+    return _whitespace.sub(" ", statement).strip()
+
+
+def analyze_queries(queries):
+    """
+    Flags structurally identical statements repeated N_PLUS_ONE_THRESHOLD times or more
+    and SELECTs that read a whole table without WHERE or LIMIT.
+    """
+    shapes = Counter(normalize_statement(statement) for statement, _ in queries)
+
+    n_plus_one = [
+        {"statement": shape, "count": count}
+        for shape, count in shapes.items()
+        if count >= N_PLUS_ONE_THRESHOLD
+    ]
+    unbounded = [
+        shape
+        for shape in shapes
+        if shape.upper().startswith("SELECT")
+        and " WHERE " not in shape.upper()
+        and " LIMIT " not in shape.upper()
+    ]
+    return {"n_plus_one": n_plus_one, "unbounded": unbounded}
+
+
+def profiling_requested(request: Request):
+    return Settings.PROFILING_ENABLED and request.headers.get(PROFILE_HEADER)
+
+
+async def profile_request(request: Request, call_next):
+    """
+    Runs the request under a sampling profiler and logs its SQL statements.
+    The profile replaces the response body, X-Profile: speedscope returns speedscope
+    JSON, any other value pyinstrument's HTML.
+    """
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries = []
+
+    profiler = Profiler(async_mode="enabled") if Profiler is not None else None
+    if profiler is not None:
+        profiler.start()
+
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Consume the body so its generation is part of the profile
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    elapsed = time.perf_counter() - started
+
+    if profiler is not None:
+        profiler.stop()
+
+    queries = stats.queries if stats is not None else []
+    report = analyze_queries(queries)
+
+    for statement, duration in queries:
+        logger.info("%.2f ms %s", duration * 1000, _whitespace.sub(" ", statement))
+    for finding in report["n_plus_one"]:
+        logger.warning(
+            "Possible N+1 in %s %s: %d x %s",
+            request.method,
+            request.url.path,
+            finding["count"],
+            finding["statement"],
+        )
+    for statement in report["unbounded"]:
+        logger.warning(
+            "Unbounded SELECT in %s %s: %s",
+            request.method,
+            request.url.path,
+            statement,
+        )
+
+    headers = {
+        "X-Profiled-Status": str(response.status_code),
+        "X-Profiled-Duration-Ms": f"{elapsed * 1000:.2f}",
+        "X-SQL-Statements": str(len(queries)),
+        "X-SQL-N-Plus-One": str(len(report["n_plus_one"])),
+    }
+
+    if profiler is None:
+        content = {
+            "status": response.status_code,
+            "body": body.decode(errors="replace"),
+            "queries": [
+                {"statement": statement, "ms": round(duration * 1000, 3)}
+                for statement, duration in queries
+            ],
+            **report,
+        }
+        return Response(
+            json.dumps(content), media_type="application/json", headers=headers
+        )
+
+    if request.headers[PROFILE_HEADER] == "speedscope":
+        return Response(
+            profiler.output(renderer=SpeedscopeRenderer()),
+            media_type="application/json",
+            headers=headers,
+        )
+    return Response(profiler.output_html(), media_type="text/html", headers=headers)
@@ -0,0 +1,51 @@
+from sqlalchemy import desc
+from sqlalchemy.future import select
+from sqlalchemy.orm import Load
+
+from models.data import Data
+from models.daily_average import DailyAverages
+from models.task import Task
+from core.sensors import SENSORS
+from core.ingest import daily_average
+
+# Read queries of the routers, shared with benchmarks/query_plans.py
+
+
+def device_data_query(device_id: str):
+    return select(
+        Data.data_id, Data.temp, Data.soil_hum, Data.air_hum, Data.light
+    ).filter(Data.device_id == device_id)
+
+
+def daily_history_query(device_id: str):
+    return (
+        select(
+            DailyAverages.daily_averages_id,
+            *(daily_average(sensor) for sensor in SENSORS),
+            DailyAverages.date,
+        )
+        .filter(DailyAverages.device_id == device_id)
+        .order_by(desc(DailyAverages.date))
+    )
+
+
+def pending_tasks_query(device_id: str):
+    return select(
+        Task.task_id,
+        Task.task_number,
+        Task.status,
+        Task.created_at,
+        Task.updated_at,
+    ).filter(Task.device_id == device_id, Task.status == 0)
+
+
+def device_task_query(device_id: str, task_id: int):
+    return (
+        select(Task)
+        .filter(Task.device_id == device_id, Task.task_id == task_id)
+        .options(
+            Load(Task).load_only(
+                Task.task_id, Task.task_number, Task.status, Task.device_id
+            )
+        )
+    )
@@ -8,6 +8,7 @@ from core.settings import Settings
 
 from redis_conf.redis_conn import redis_client
 from redis_conf.rate_limiting_util import RateLimiter
+from core.token_cache import TokenCache
 
 JWT_SECRET_KEY = Settings.JWT_SECRET_KEY
 ALGORITHM = Settings.ALGORITHM
@@ -15,7 +16,14 @@ ALGORITHM = Settings.ALGORITHM
 security = HTTPBearer()
 
 rate_limiter = RateLimiter(
-    redis_client, threshold=5, reset_interval=timedelta(minutes=15)
+    redis_client,
+    threshold=5,
+    reset_interval=timedelta(minutes=15),
+    whitelist=Settings.WHITELIST_IPS,
+)
+
+token_cache = TokenCache(
+    maxsize=Settings.TOKEN_CACHE_SIZE, ttl=Settings.TOKEN_CACHE_TTL_SECONDS
 )
 
 
@@ -40,9 +48,17 @@ async def get_device_id(
 ):
     ip = request.client.host
 
-    if rate_limiter.is_rate_limited(ip):
+    failed_attempts = await rate_limiter.get_failed_attempts(ip)
+    if rate_limiter.exceeds_threshold(ip, failed_attempts):
         raise HTTPException(status_code=429, detail="Too many failed attempts")
 
+    # Tokens are reused for their whole lifetime, skip verifying them again
+    device_id = token_cache.get(token.credentials)
+    if device_id is not None:
+        if failed_attempts:
+            await rate_limiter.reset_failures(ip)
+        return device_id
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -58,14 +74,17 @@ async def get_device_id(
             headers={"WWW-Authenticate": "Bearer"},
         )
     except Exception as e:
-        rate_limiter.record_failure(ip)
+        await rate_limiter.record_failure(ip)
         raise credentials_exception
 
     device_id = payload.get("sub")
-    device_id = str(device_id)
 
     if device_id is None:
         raise credentials_exception
 
-    rate_limiter.reset_failures(ip)
+    device_id = str(device_id)
+    token_cache.set(token.credentials, device_id, payload.get("exp"))
+
+    if failed_attempts:
+        await rate_limiter.reset_failures(ip)
     return device_id
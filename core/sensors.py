@@ -0,0 +1,2 @@
+# Sensors of a reading, in the order of the binary reading format and the bounds check
+SENSORS = ("temp", "soil_hum", "air_hum", "light")
@@ -6,9 +6,58 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL_ASYNC")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY")
     ALGORITHM: str = os.getenv("ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+    TOKEN_CACHE_TTL_SECONDS: int = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", 900))
+    DEVICE_CACHE_TTL_SECONDS: int = int(os.getenv("DEVICE_CACHE_TTL_SECONDS", 60))
+    MAX_TASK_WAIT_SECONDS: int = int(os.getenv("MAX_TASK_WAIT_SECONDS", 30))
+    RUBY_BACKEND_URL: str = os.getenv(
+        "RUBY_BACKEND_URL", "https://ruby-backend-api.greenmind.site/"
+    )
+    BACKEND_TIMEOUT_SECONDS: float = float(os.getenv("BACKEND_TIMEOUT_SECONDS", 5))
+    BACKEND_RETRIES: int = int(os.getenv("BACKEND_RETRIES", 2))
+    BACKEND_MAX_CONNECTIONS: int = int(os.getenv("BACKEND_MAX_CONNECTIONS", 20))
+    BACKEND_CIRCUIT_FAILURES: int = int(os.getenv("BACKEND_CIRCUIT_FAILURES", 5))
+    BACKEND_CIRCUIT_RESET_SECONDS: float = float(
+        os.getenv("BACKEND_CIRCUIT_RESET_SECONDS", 30)
+    )
+    JOB_POLL_INTERVAL_SECONDS: int = int(os.getenv("JOB_POLL_INTERVAL_SECONDS", 60))
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_N_PLUS_ONE_THRESHOLD: int = int(
+        os.getenv("PROFILING_N_PLUS_ONE_THRESHOLD", 3)
+    )
+    # Comma separated IPs exempt from rate limiting and throttling
+    WHITELIST_IPS: set = {
+        ip.strip()
+        for ip in os.getenv("WHITELIST_IPS", "13.48.70.59").split(",")
+        if ip.strip()
+    }
+    THROTTLE_ENABLED: bool = os.getenv("THROTTLE_ENABLED", "true").lower() == "true"
+    # JSON {"default" | "<METHOD> <route path>": [capacity, refill per second]}
+    THROTTLE_BUDGETS: str = os.getenv("THROTTLE_BUDGETS", "{}")
+    THROTTLE_LEASE_SIZE: int = int(os.getenv("THROTTLE_LEASE_SIZE", 5))
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", 100))
+    # JSON {<sensor>: [low, high]}
+    SENSOR_BOUNDS: str = os.getenv("SENSOR_BOUNDS", "{}")
+    MAX_BATCH_SIZE: int = int(os.getenv("MAX_BATCH_SIZE", 500))
+    HISTORY_MAX_POINTS: int = int(os.getenv("HISTORY_MAX_POINTS", 1000))
+    EXPORT_CHUNK_SIZE: int = int(os.getenv("EXPORT_CHUNK_SIZE", 1000))
+    WRITE_BEHIND_ENABLED: bool = (
+        os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+    )
+    WRITE_BEHIND_FLUSH_INTERVAL_MS: int = int(
+        os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", 500)
+    )
+    WRITE_BEHIND_FLUSH_SIZE: int = int(os.getenv("WRITE_BEHIND_FLUSH_SIZE", 1000))
 
 
 settings = Settings()
@@ -0,0 +1,82 @@
+import json
+import math
+import logging
+from typing import Dict, Tuple
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from core.settings import Settings
+from core.metrics import route_template, REQUESTS_THROTTLED
+from core.security import token_cache
+from redis_conf.redis_conn import redis_client
+from redis_conf.throttle_util import Throttle
+
+logger = logging.getLogger(__name__)
+
+# (capacity, refill per second) per "<METHOD> <route path>", THROTTLE_BUDGETS overrides
+DEFAULT_BUDGETS = {
+    "default": (120, 2.0),
+    "POST /request_token": (10, 0.2),
+    "POST /authorize_device": (5, 0.05),
+}
+
+
+def load_budgets() -> Dict[str, Tuple[int, float]]:
+    budgets = dict(DEFAULT_BUDGETS)
+    overrides = json.loads(Settings.THROTTLE_BUDGETS or "{}")
+    for route, (capacity, rate) in overrides.items():
+        budgets[route] = (int(capacity), float(rate))
+    return budgets
+
+
+budgets = load_budgets()
+
+throttle = Throttle(redis_client, lease_size=Settings.THROTTLE_LEASE_SIZE)
+
+
+def client_identities(request: Request):
+    """
+    The budgets a request is counted against: always the client IP's, and also the
+    device's when the request carries a token get_device_id has already verified.
+    Unverified tokens never choose a bucket, and a device token never lets a client
+    escape its IP's budget.
+    """
+    identities = [("ip", request.client.host)]
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        device_id = token_cache.peek(credentials)
+        if device_id is not None:
+            identities.append(("device", device_id))
+    return identities
+
+
+async def throttle_request(request: Request):
+    """
+    Returns a 429 response when the client has used up its budget for the route.
+    """
+    if request.client.host in Settings.WHITELIST_IPS:
+        return None
+
+    route = f"{request.method} {route_template(request)}"
+    capacity, rate = budgets.get(route, budgets["default"])
+
+    for scope, identity in client_identities(request):
+        try:
+            retry_after = await throttle.acquire(
+                f"{scope}:{identity}:{route}", capacity, rate
+            )
+        except Exception:
+            # Requests go through when Redis is unavailable
+            logger.exception("Throttle check failed")
+            return None
+        if retry_after:
+            break
+    else:
+        return None
+
+    REQUESTS_THROTTLED.labels(route, scope).inc()
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests"},
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
@@ -0,0 +1,57 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of already verified tokens mapped to their device_id.
+    Entries expire after ttl seconds, but never later than the token's own exp.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[str]:
+        entry = self._entries.get(token)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        device_id, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[token]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return device_id
+
+    def peek(self, token: str) -> Optional[str]:
+        """
+        Like get, but leaves hit counters and LRU order alone.
+        """
+        entry = self._entries.get(token)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def set(self, token: str, device_id: str, exp: Optional[float]):
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+
+        self._entries[token] = (device_id, expires_at)
+        self._entries.move_to_end(token)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+
+from models.historical_data import HistoricalData
+
+from dependencies import async_session
+from core.settings import Settings
+from redis_conf.version_util import device_versions
+from redis_conf.rollup_util import hourly_rollups
+
+from core.ingest import (
+    upsert_data,
+    new_aggregate,
+    merge_aggregate,
+    increment_daily_aggregates,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Coalesces live readings per device_id in memory and writes them out as one bulk upsert
+    every flush_interval seconds or as soon as flush_size devices are pending.
+    Daily aggregates and hourly rollups still count every reading, they are merged in
+    memory until the flush.
+    """
+
+    def __init__(self, session_factory, flush_interval: float, flush_size: int):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._pending: Dict[str, dict] = {}
+        self._aggregates: Dict[tuple, dict] = {}
+        self._hourly: Dict[tuple, dict] = {}
+        # Rollups closed in Redis but not yet written, kept across failed flushes
+        self._rollups: List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    def put(self, row: dict):
+        # A newer reading replaces the pending one, only the latest value matters
+        self._pending[row["device_id"]] = row
+        self._merge_aggregate(self._aggregates, new_aggregate(row), "date")
+        self._merge_aggregate(self._hourly, new_aggregate(row, "hour"), "hour")
+        if len(self._pending) >= self.flush_size:
+            self._wakeup.set()
+
+    def _merge_aggregate(
+        self, aggregates: Dict[tuple, dict], aggregate: dict, period: str
+    ):
+        key = (aggregate["device_id"], aggregate[period])
+        if key in aggregates:
+            merge_aggregate(aggregates[key], aggregate)
+        else:
+            aggregates[key] = aggregate
+
+    def start(self):
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._closing = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed")
+
+    async def flush(self):
+        # Hourly partials and closed rollups may be left over from a failed flush
+        if not (self._pending or self._hourly or self._rollups):
+            return
+
+        rows, self._pending = list(self._pending.values()), {}
+        aggregates, self._aggregates = list(self._aggregates.values()), {}
+        hourly, self._hourly = list(self._hourly.values()), {}
+
+        try:
+            self._rollups.extend(await hourly_rollups.add(hourly))
+        except Exception:
+            # Partials stay in memory and are sent again with the next flush
+            logger.exception("Hourly rollup update failed")
+            for partial in hourly:
+                self._merge_aggregate(self._hourly, partial, "hour")
+        rollups, self._rollups = self._rollups, []
+
+        try:
+            async with self.session_factory() as db:
+                try:
+                    await self._write(db, rows, aggregates, rollups)
+                    await db.commit()
+                except IntegrityError:
+                    # A device was deleted meanwhile, write devices one by one and
+                    # skip it
+                    await db.rollback()
+                    device_ids = {row["device_id"] for row in rows} | {
+                        rollup["device_id"] for rollup in rollups
+                    }
+                    for device_id in device_ids:
+                        try:
+                            async with db.begin_nested():
+                                await self._write(
+                                    db,
+                                    [
+                                        row
+                                        for row in rows
+                                        if row["device_id"] == device_id
+                                    ],
+                                    [
+                                        aggregate
+                                        for aggregate in aggregates
+                                        if aggregate["device_id"] == device_id
+                                    ],
+                                    [
+                                        rollup
+                                        for rollup in rollups
+                                        if rollup["device_id"] == device_id
+                                    ],
+                                )
+                        except IntegrityError:
+                            logger.warning(
+                                "Dropped readings for unknown device %s", device_id
+                            )
+                    await db.commit()
+        except Exception:
+            # Keep unwritten rows unless a newer reading has arrived in the meantime
+            for row in rows:
+                self._pending.setdefault(row["device_id"], row)
+            for aggregate in aggregates:
+                self._merge_aggregate(self._aggregates, aggregate, "date")
+            self._rollups = rollups + self._rollups
+            raise
+
+        # Readers' ETags change only once the readings are visible in the database
+        if rows:
+            await device_versions.bump([row["device_id"] for row in rows], "data")
+
+    async def _write(
+        self, db, rows: List[dict], aggregates: List[dict], rollups: List[dict]
+    ):
+        if rows:
+            await db.execute(upsert_data(rows))
+
+        if rollups:
+            await db.execute(insert(HistoricalData).values(rollups))
+
+        if aggregates:
+            await db.execute(increment_daily_aggregates(aggregates))
+
+
+write_behind_buffer = WriteBehindBuffer(
+    async_session,
+    flush_interval=Settings.WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000,
+    flush_size=Settings.WRITE_BEHIND_FLUSH_SIZE,
+)
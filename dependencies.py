@@ -1,20 +1,42 @@
 from dotenv import load_dotenv
+from fastapi import Request
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from core.settings import Settings
+from core.metrics import InstrumentedPool, instrument_engine
 
 load_dotenv()
 
 DATABASE_URL = Settings.DATABASE_URL
 
+connect_args = {}
+if DATABASE_URL.startswith("postgresql+asyncpg"):
+    connect_args["prepared_statement_cache_size"] = Settings.DB_STATEMENT_CACHE_SIZE
+
 
 # Creating database connection
-engine = create_async_engine(DATABASE_URL, future=True)
+engine = create_async_engine(
+    DATABASE_URL,
+    future=True,
+    poolclass=InstrumentedPool,
+    pool_size=Settings.DB_POOL_SIZE,
+    max_overflow=Settings.DB_MAX_OVERFLOW,
+    pool_timeout=Settings.DB_POOL_TIMEOUT,
+    pool_recycle=Settings.DB_POOL_RECYCLE,
+    pool_pre_ping=Settings.DB_POOL_PRE_PING,
+    connect_args=connect_args,
+)
+instrument_engine(engine)
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
 # Dependency for getting the database session
-async def get_db():
-    async with async_session() as session:
-        yield session
+async def get_db(request: Request):
+    """
+    Returns the request's session, created on first use. Every dependency of a request
+    shares it and db_session_middleware closes it once the response is ready.
+    """
+    if getattr(request.state, "db", None) is None:
+        request.state.db = async_session()
+    return request.state.db
@@ -1,7 +1,28 @@
+import time
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Response, Request
-from fastapi.responses import JSONResponse
-from dependencies import async_session
+from fastapi.responses import JSONResponse, ORJSONResponse
+from dependencies import engine
+from core.settings import Settings
+from core.write_behind import write_behind_buffer
+from core.backend_client import backend_client
+from core.jobs import job_worker, job_notifier
+from core.security import token_cache
+from core.profiling import profiling_requested, profile_request
+from core.throttling import throttle_request
+from core.metrics import (
+    RequestStats,
+    request_stats,
+    route_template,
+    observe_request,
+    server_timing,
+    REQUESTS_IN_FLIGHT,
+    TOKEN_CACHE_HITS,
+    TOKEN_CACHE_MISSES,
+)
+from redis_conf.redis_conn import redis_pool
+from redis_conf.notifier import task_notifier
 
 from routers import (
     device_route,
@@ -9,15 +30,43 @@ from routers import (
     task_route,
     auth_route,
     default_route,
+    metrics_route,
+    export_route,
 )
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    backend_client.start()
+    task_notifier.start()
+    job_notifier.start()
+    job_worker.start()
+    if Settings.WRITE_BEHIND_ENABLED:
+        write_behind_buffer.start()
+    yield
+    await job_worker.stop()
+    await job_notifier.stop()
+    await task_notifier.stop()
+    # Drain pending readings before the process exits
+    if Settings.WRITE_BEHIND_ENABLED:
+        await write_behind_buffer.stop()
+    await backend_client.stop()
+    await redis_pool.disconnect()
+    await engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.include_router(device_route.router)
 app.include_router(default_route.router)
 app.include_router(data_route.router)
 app.include_router(task_route.router)
 app.include_router(auth_route.router)
+app.include_router(metrics_route.router)
+app.include_router(export_route.router)
+
+TOKEN_CACHE_HITS.set_function(lambda: token_cache.hits)
+TOKEN_CACHE_MISSES.set_function(lambda: token_cache.misses)
 
 
 async def rate_limit_handler(request, exc):
@@ -27,15 +76,56 @@ async def rate_limit_handler(request, exc):
 @app.middleware("http")
 async def db_session_middleware(request: Request, call_next):
     response = Response("Internal server error", status_code=500)
+    # The session itself is only created when a route asks for it, see get_db
+    request.state.db = None
     try:
-        request.state.db = async_session()
         response = await call_next(request)
     except Exception as e:
         return Response(f"Internal server error: {e}", status_code=500)
     finally:
-        await request.state.db.close()
+        if request.state.db is not None:
+            await request.state.db.close()
     return response
 
 
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    if profiling_requested(request):
+        return await profile_request(request, call_next)
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def throttling_middleware(request: Request, call_next):
+    if Settings.THROTTLE_ENABLED:
+        response = await throttle_request(request)
+        if response is not None:
+            return response
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    method, route = request.method, route_template(request)
+    stats = RequestStats()
+    token = request_stats.set(stats)
+
+    in_flight = REQUESTS_IN_FLIGHT.labels(method, route)
+    in_flight.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["Server-Timing"] = server_timing(
+            stats, time.perf_counter() - started
+        )
+        return response
+    finally:
+        observe_request(method, route, status, time.perf_counter() - started, stats)
+        in_flight.dec()
+        request_stats.reset(token)
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port="8000", log_level="info")
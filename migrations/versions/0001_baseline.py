@@ -0,0 +1,78 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+The schema from before migrations existed. Databases created back then already have
+it, mark them with `alembic stamp 0001` and upgrade from there.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from core.sensors import SENSORS
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def sensor_columns(prefix=""):
+    return [sa.Column(f"{prefix}{sensor}", sa.Float) for sensor in SENSORS]
+
+
+def upgrade():
+    op.create_table(
+        "devices",
+        sa.Column("device_id", sa.String, primary_key=True),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+    )
+    op.create_index("ix_devices_device_id", "devices", ["device_id"])
+
+    op.create_table(
+        "data",
+        sa.Column("data_id", sa.Integer, primary_key=True),
+        sa.Column(
+            "device_id", sa.String, sa.ForeignKey("devices.device_id"), unique=True
+        ),
+        *sensor_columns(),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+    )
+
+    op.create_table(
+        "tasks",
+        sa.Column("task_id", sa.Integer, primary_key=True),
+        sa.Column("device_id", sa.String, sa.ForeignKey("devices.device_id")),
+        sa.Column("task_number", sa.Integer),
+        sa.Column("status", sa.Integer),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+    )
+    op.create_index("ix_tasks_task_id", "tasks", ["task_id"])
+
+    op.create_table(
+        "historical_data",
+        sa.Column("historical_data_id", sa.Integer, primary_key=True),
+        sa.Column("device_id", sa.String, sa.ForeignKey("devices.device_id")),
+        *sensor_columns(),
+        sa.Column("created_at", sa.DateTime),
+    )
+
+    op.create_table(
+        "daily_averages",
+        sa.Column("daily_averages_id", sa.Integer, primary_key=True),
+        sa.Column("device_id", sa.String, sa.ForeignKey("devices.device_id")),
+        *sensor_columns("avg_"),
+        sa.Column("date", sa.Date),
+    )
+
+
+def downgrade():
+    op.drop_table("daily_averages")
+    op.drop_table("historical_data")
+    op.drop_table("tasks")
+    op.drop_table("data")
+    op.drop_table("devices")
@@ -0,0 +1,96 @@
+"""aggregates, hourly rollups, jobs and partitioning
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Schema changes made alongside the running aggregates (daily_averages sample_count,
+sum/min/max and the (device_id, date) unique key), the hourly rollups of
+historical_data, the durable job queue and range partitioning. Every step checks
+what is already there, so databases that applied some of them by hand upgrade too.
+"""
+import os
+import sys
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from partitions import PARTITIONED_TABLES, first_day, partition_table_ddl
+from core.sensors import SENSORS
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def add_columns(table, columns):
+    for column, type_ in columns:
+        op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {type_}")
+
+
+def upgrade():
+    add_columns(
+        "daily_averages",
+        [("sample_count", "INTEGER")]
+        + [
+            (f"{kind}_{sensor}", "DOUBLE PRECISION")
+            for sensor in SENSORS
+            for kind in ("sum", "min", "max")
+        ],
+    )
+    add_columns(
+        "historical_data",
+        [("sample_count", "INTEGER")]
+        + [
+            (f"{kind}_{sensor}", "DOUBLE PRECISION")
+            for kind in ("min", "max")
+            for sensor in SENSORS
+        ],
+    )
+    # Briefly used for hourly point samples, replaced by the rollups
+    op.execute("ALTER TABLE data DROP COLUMN IF EXISTS last_historical_at")
+
+    if not sa.inspect(op.get_bind()).has_table("jobs"):
+        op.create_table(
+            "jobs",
+            sa.Column("job_id", sa.Integer, primary_key=True),
+            sa.Column("kind", sa.String, nullable=False),
+            sa.Column("payload", sa.JSON),
+            sa.Column("attempts", sa.Integer),
+            sa.Column("last_error", sa.String),
+            sa.Column("available_at", sa.DateTime),
+            sa.Column("created_at", sa.DateTime),
+        )
+        op.create_index("ix_jobs_job_id", "jobs", ["job_id"])
+        op.create_index("ix_jobs_available_at", "jobs", ["available_at"])
+
+    # Partitioned with dated partitions up to PARTITIONS_AHEAD days and a default one,
+    # daily_averages gets its (device_id, date) unique key on the way
+    bind = op.get_bind()
+    today = datetime.utcnow().date()
+    for table, (_, column, _) in PARTITIONED_TABLES.items():
+        partitioned = bind.execute(
+            sa.text(
+                """
+                SELECT 1 FROM pg_partitioned_table p
+                JOIN pg_class c ON c.oid = p.partrelid
+                WHERE c.relname = :table
+            """
+            ),
+            {"table": table},
+        ).first()
+        if partitioned:
+            continue
+
+        first = bind.execute(sa.text(f"SELECT MIN({column}) FROM {table}")).scalar()
+        for statement in partition_table_ddl(table, first_day(first, today), today):
+            bind.execute(sa.text(statement))
+
+
+def downgrade():
+    raise NotImplementedError("Partitioning and the copied rows cannot be undone")
@@ -0,0 +1,40 @@
+"""indexes for hot queries
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+daily_averages (device_id, date) and data (device_id) are already covered by their
+unique constraints.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Created on the partitioned parent, PostgreSQL adds it to every partition
+    op.create_index(
+        "ix_historical_data_device_id_created_at",
+        "historical_data",
+        ["device_id", "created_at"],
+    )
+    op.create_index("ix_tasks_device_id_status", "tasks", ["device_id", "status"])
+    op.create_index(
+        "ix_tasks_pending",
+        "tasks",
+        ["device_id", "task_id"],
+        postgresql_where=sa.text("status = 0"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_tasks_pending", table_name="tasks")
+    op.drop_index("ix_tasks_device_id_status", table_name="tasks")
+    op.drop_index(
+        "ix_historical_data_device_id_created_at", table_name="historical_data"
+    )
@@ -1,14 +1,39 @@
-from sqlalchemy import Column, Integer, ForeignKey, Float, Date, String
+from sqlalchemy import (
+    Column,
+    Integer,
+    ForeignKey,
+    Float,
+    Date,
+    String,
+    UniqueConstraint,
+)
 from datetime import date
 from models.base import Base
 
 
 class DailyAverages(Base):
     __tablename__ = "daily_averages"
-    daily_averages_id = Column(Integer, primary_key=True)
+    __table_args__ = (
+        UniqueConstraint("device_id", "date"),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
+    daily_averages_id = Column(Integer, primary_key=True, autoincrement=True)
     device_id = Column(String, ForeignKey("devices.device_id"))
     avg_temp = Column(Float)
     avg_soil_hum = Column(Float)
     avg_air_hum = Column(Float)
     avg_light = Column(Float)
-    date = Column(Date, default=date.today)
+    date = Column(Date, primary_key=True, default=date.today)
+    sample_count = Column(Integer)
+    sum_temp = Column(Float)
+    min_temp = Column(Float)
+    max_temp = Column(Float)
+    sum_soil_hum = Column(Float)
+    min_soil_hum = Column(Float)
+    max_soil_hum = Column(Float)
+    sum_air_hum = Column(Float)
+    min_air_hum = Column(Float)
+    max_air_hum = Column(Float)
+    sum_light = Column(Float)
+    min_light = Column(Float)
+    max_light = Column(Float)
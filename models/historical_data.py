@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime, String
+from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime, String, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from models.base import Base
@@ -6,11 +6,25 @@ from models.base import Base
 
 class HistoricalData(Base):
     __tablename__ = "historical_data"
-    historical_data_id = Column(Integer, primary_key=True)
+    __table_args__ = (
+        Index("ix_historical_data_device_id_created_at", "device_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    historical_data_id = Column(Integer, primary_key=True, autoincrement=True)
     device_id = Column(String, ForeignKey("devices.device_id"))
     temp = Column(Float)
     soil_hum = Column(Float)
     air_hum = Column(Float)
     light = Column(Float)
+    # Hourly rollup: the sensor columns above hold the mean of sample_count readings
+    sample_count = Column(Integer)
+    min_temp = Column(Float)
+    min_soil_hum = Column(Float)
+    min_air_hum = Column(Float)
+    min_light = Column(Float)
+    max_temp = Column(Float)
+    max_soil_hum = Column(Float)
+    max_air_hum = Column(Float)
+    max_light = Column(Float)
     device = relationship("Device", back_populates="historical_data")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, DateTime, String, JSON
+from datetime import datetime
+from models.base import Base
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    job_id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON)
+    attempts = Column(Integer, default=0)
+    last_error = Column(String)
+    available_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, String
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from models.base import Base
@@ -6,6 +6,13 @@ from models.base import Base
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_device_id_status", "device_id", "status"),
+        # The task poll only asks for pending tasks
+        Index(
+            "ix_tasks_pending", "device_id", "task_id", postgresql_where=text("status = 0")
+        ),
+    )
     task_id = Column(Integer, primary_key=True, index=True)
     device_id = Column(String, ForeignKey("devices.device_id"))
     task_number = Column(Integer)
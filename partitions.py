@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+from datetime import date, datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+DBHOST = os.getenv("DBHOST")
+DBUSER = os.getenv("DBUSER")
+DBNAME = os.getenv("DBNAME")
+DBPASSWORD = os.getenv("DBPASSWORD")
+
+PARTITION_INTERVAL = os.getenv("PARTITION_INTERVAL", "day")
+PARTITIONS_AHEAD = int(os.getenv("PARTITIONS_AHEAD", 7))
+
+# Partitioned table -> (primary key column, partition key column, unique columns)
+PARTITIONED_TABLES = {
+    "historical_data": ("historical_data_id", "created_at", None),
+    "daily_averages": ("daily_averages_id", "date", ("device_id", "date")),
+}
+
+
+def partition_start(day: date):
+    if PARTITION_INTERVAL == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def partition_end(start: date):
+    if PARTITION_INTERVAL == "week":
+        return start + timedelta(days=7)
+    return start + timedelta(days=1)
+
+
+def partition_name(table: str, start: date):
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def is_partitioned(cur, table: str):
+    cur.execute(
+        """
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = %s
+    """,
+        (table,),
+    )
+    return cur.fetchone() is not None
+
+
+def partition_ddl(table: str, first: date, last: date):
+    """
+    CREATE statements for partitions of table covering every period from first to
+    last, both included. Dates are inlined, DDL takes no bind parameters.
+    """
+    start = partition_start(first)
+    statements = []
+
+    while start <= last:
+        end = partition_end(start)
+        statements.append(
+            f"""
+            CREATE TABLE IF NOT EXISTS {partition_name(table, start)}
+            PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')
+        """
+        )
+        start = end
+
+    return statements
+
+
+def create_partitions(cur, table: str, first: date, last: date):
+    """
+    Creates partitions of table covering every period from first to last, both included.
+    """
+    statements = partition_ddl(table, first, last)
+    for statement in statements:
+        cur.execute(statement)
+    return len(statements)
+
+
+def create_upcoming_partitions(conn, today: date):
+    cur = conn.cursor()
+    created = 0
+
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(cur, table):
+            created += create_partitions(
+                cur, table, today, today + timedelta(days=PARTITIONS_AHEAD)
+            )
+
+    conn.commit()
+    cur.close()
+    return created
+
+
+def drop_expired_partitions(conn, table: str, cutoff: date):
+    """
+    Detaches and drops partitions of table whose whole range lies before cutoff.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s AND child.relname LIKE %s
+    """,
+        (table, f"{table}_p%"),
+    )
+    partitions = [row[0] for row in cur.fetchall()]
+
+    dropped = 0
+    for partition in sorted(partitions):
+        start = datetime.strptime(partition[len(table) + 2 :], "%Y%m%d").date()
+        if partition_end(start) > cutoff:
+            continue
+
+        cur.execute(f"ALTER TABLE {table} DETACH PARTITION {partition}")
+        cur.execute(f"DROP TABLE {partition}")
+        conn.commit()
+        dropped += 1
+
+    cur.close()
+    return dropped
+
+
+def partition_table_ddl(table: str, first: date, today: date):
+    """
+    Statements converting a plain table of PARTITIONED_TABLES into a range partitioned
+    one with partitions from first up to PARTITIONS_AHEAD days from today and a default
+    one. Rows are copied over, keeping only the newest row per unique key: reruns of the
+    old nightly job left duplicate daily_averages rows behind.
+    """
+    key, column, unique = PARTITIONED_TABLES[table]
+    legacy = f"{table}_legacy"
+
+    statements = [
+        f"ALTER TABLE {table} RENAME TO {legacy}",
+        f"""
+        CREATE TABLE {table}
+        (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE ({column})
+    """,
+        f"ALTER SEQUENCE {table}_{key}_seq OWNED BY {table}.{key}",
+        f"ALTER TABLE {table} ADD PRIMARY KEY ({key}, {column})",
+        f"""
+        ALTER TABLE {table}
+        ADD FOREIGN KEY (device_id) REFERENCES devices (device_id)
+    """,
+    ]
+    if unique:
+        statements.append(f"ALTER TABLE {table} ADD UNIQUE ({', '.join(unique)})")
+
+    statements += partition_ddl(table, first, today + timedelta(days=PARTITIONS_AHEAD))
+    statements.append(
+        f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"
+    )
+
+    if unique:
+        statements.append(
+            f"""
+            INSERT INTO {table}
+            SELECT DISTINCT ON ({', '.join(unique)}) * FROM {legacy}
+            WHERE {column} IS NOT NULL
+            ORDER BY {', '.join(unique)}, {key} DESC
+        """
+        )
+    else:
+        statements.append(
+            f"INSERT INTO {table} SELECT * FROM {legacy} WHERE {column} IS NOT NULL"
+        )
+    statements.append(f"DROP TABLE {legacy}")
+    return statements
+
+
+def first_day(value, today: date):
+    # MIN() of a partition key column, None for an empty table
+    if value is None:
+        return today
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def partition_table(cur, table: str, today: date):
+    """
+    Converts a plain table of PARTITIONED_TABLES into a range partitioned one.
+    Returns the number of copied rows, or None if the table is already partitioned.
+    """
+    if is_partitioned(cur, table):
+        return None
+
+    column = PARTITIONED_TABLES[table][1]
+    cur.execute(f"SELECT MIN({column}) FROM {table}")
+    first = first_day(cur.fetchone()[0], today)
+
+    for statement in partition_table_ddl(table, first, today):
+        cur.execute(statement)
+
+    cur.execute(f"SELECT COUNT(*) FROM {table}")
+    return cur.fetchone()[0]
+
+
+def migrate(conn, today: date):
+    """
+    Converts the plain historical_data and daily_averages tables into range partitioned
+    ones, copying existing rows. Each table is migrated in its own transaction.
+    """
+    cur = conn.cursor()
+
+    for table in PARTITIONED_TABLES:
+        copied = partition_table(cur, table, today)
+        conn.commit()
+
+        if copied is None:
+            print(f"{table}: already partitioned")
+        else:
+            print(f"{table}: partitioned by {PARTITION_INTERVAL}, {copied} rows copied")
+
+    cur.close()
+
+
+if __name__ == "__main__":
+    import psycopg2
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "command",
+        choices=["migrate", "maintain"],
+        help="migrate: partition existing tables, maintain: create upcoming partitions",
+    )
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        dbname=DBNAME, user=DBUSER, password=DBPASSWORD, host=DBHOST
+    )
+    today = datetime.utcnow().date()
+
+    if args.command == "migrate":
+        migrate(conn, today)
+    else:
+        print(f"created {create_upcoming_partitions(conn, today)} partitions")
+
+    conn.close()
@@ -0,0 +1,82 @@
+import time
+import redis.asyncio as redis
+from typing import Awaitable, Callable, Dict, Iterable
+
+from core.settings import Settings
+from redis_conf.redis_conn import redis_client
+
+WARM_BATCH_SIZE = 10000
+
+
+class DeviceRegistry:
+    """
+    Set of existing device ids in Redis, with a short-lived in-process set of recently
+    seen ids in front of it. The Redis set is filled from the database once, after that
+    unknown ids are answered without a database query.
+    Only known devices are cached locally, a device deleted through another worker may
+    still be reported for up to ttl seconds.
+    """
+
+    def __init__(self, redis_client: redis.Redis, ttl: float):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.key = "devices"
+        # Separate key, so the marker can never be taken for a device id
+        self.warm_key = "devices:warm"
+        self._local: Dict[str, float] = {}
+
+    def _remember(self, device_id: str):
+        self._local[device_id] = time.monotonic() + self.ttl
+
+    def _seen(self, device_id: str):
+        expires = self._local.get(device_id)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self._local[device_id]
+            return False
+        return True
+
+    async def exists(
+        self, device_id: str, load: Callable[[], Awaitable[Iterable[str]]]
+    ):
+        """
+        Whether the device exists. load returns every device id from the database, it
+        is only awaited when the Redis set has not been filled yet.
+        """
+        if self._seen(device_id):
+            return True
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.sismember(self.key, device_id)
+            pipe.exists(self.warm_key, self.key)
+            member, filled = await pipe.execute()
+
+        # Both keys must be there, an evicted set is filled again
+        if filled < 2:
+            device_ids = set(await load())
+            await self.warm(device_ids)
+            member = device_id in device_ids
+
+        if member:
+            self._remember(device_id)
+        return bool(member)
+
+    async def warm(self, device_ids: Iterable[str]):
+        device_ids = list(device_ids)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for start in range(0, len(device_ids), WARM_BATCH_SIZE):
+                pipe.sadd(self.key, *device_ids[start : start + WARM_BATCH_SIZE])
+            pipe.set(self.warm_key, 1)
+            await pipe.execute()
+
+    async def add(self, device_id: str):
+        await self.redis_client.sadd(self.key, device_id)
+        self._remember(device_id)
+
+    async def remove(self, device_id: str):
+        self._local.pop(device_id, None)
+        await self.redis_client.srem(self.key, device_id)
+
+
+device_registry = DeviceRegistry(redis_client, ttl=Settings.DEVICE_CACHE_TTL_SECONDS)
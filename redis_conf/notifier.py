@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import redis.asyncio as redis
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional, Set
+
+from redis_conf.redis_conn import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class Notifier:
+    """
+    Wakes up coroutines waiting on a key when the key is published on Redis pub/sub by
+    any worker. One pattern subscription per process serves every local waiter.
+    """
+
+    def __init__(self, redis_client: redis.Redis, channel_prefix: str):
+        self.redis_client = redis_client
+        self.channel_prefix = channel_prefix
+        self._waiters: Dict[str, Set[asyncio.Event]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+
+    def _get_channel(self, key: str):
+        return f"{self.channel_prefix}:{key}"
+
+    async def publish(self, key: str):
+        await self.redis_client.publish(self._get_channel(key), 1)
+
+    @contextmanager
+    def subscribe(self, key: str):
+        event = asyncio.Event()
+        self._waiters[key].add(event)
+        try:
+            yield event
+        finally:
+            self._waiters[key].discard(event)
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def start(self):
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        prefix_length = len(self.channel_prefix) + 1
+
+        while True:
+            try:
+                async with self.redis_client.pubsub() as pubsub:
+                    await pubsub.psubscribe(self._get_channel("*"))
+                    async for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+
+                        key = message["channel"].decode()[prefix_length:]
+                        for event in self._waiters.get(key, ()):
+                            event.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost pub/sub subscription, reconnecting")
+                await asyncio.sleep(1)
+
+
+task_notifier = Notifier(redis_client, "device_tasks")
@@ -1,5 +1,6 @@
-import redis
+import redis.asyncio as redis
 from datetime import timedelta
+from typing import Iterable
 
 
 class RateLimiter:
@@ -8,31 +9,44 @@ class RateLimiter:
         redis_client: redis.Redis,
         threshold: int,
         reset_interval: timedelta,
+        whitelist: Iterable[str] = (),
     ):
         self.redis_client = redis_client
         self.threshold = threshold
         self.reset_interval = reset_interval
-        self.whitelist_ip = "13.48.70.59"
+        self.whitelist = set(whitelist)
 
     def _get_redis_key(self, ip: str):
         return f"failed_attempts:{ip}"
 
-    def is_rate_limited(self, ip: str):
-        if ip == self.whitelist_ip:
+    async def get_failed_attempts(self, ip: str):
+        key = self._get_redis_key(ip)
+        failed_attempts = await self.redis_client.get(key)
+
+        return int(failed_attempts) if failed_attempts else 0
+
+    def exceeds_threshold(self, ip: str, failed_attempts: int):
+        if ip in self.whitelist:
             return False
 
-        key = self._get_redis_key(ip)
-        failed_attempts = self.redis_client.get(key)
+        return failed_attempts >= self.threshold
 
-        if failed_attempts and int(failed_attempts) >= self.threshold:
-            return True
-        return False
+    async def is_rate_limited(self, ip: str):
+        if ip in self.whitelist:
+            return False
+
+        failed_attempts = await self.get_failed_attempts(ip)
+        return self.exceeds_threshold(ip, failed_attempts)
 
-    def record_failure(self, ip: str):
+    async def record_failure(self, ip: str):
         key = self._get_redis_key(ip)
-        self.redis_client.incr(key)
-        self.redis_client.expire(key, int(self.reset_interval.total_seconds()))
 
-    def reset_failures(self, ip: str):
+        # INCR and EXPIRE in one MULTI/EXEC round trip
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.incr(key)
+            pipe.expire(key, int(self.reset_interval.total_seconds()))
+            await pipe.execute()
+
+    async def reset_failures(self, ip: str):
         key = self._get_redis_key(ip)
-        self.redis_client.delete(key)
+        await self.redis_client.delete(key)
@@ -1,4 +1,34 @@
-import redis
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
 
-# Connect to Redis server
-redis_client = redis.Redis(host="127.0.0.1", port=6379, db=0)
+from core.settings import Settings
+from core.metrics import redis_timer
+
+
+class InstrumentedRedis(redis.Redis):
+    """
+    Redis client timing every command, script call and pipeline with redis_timer, so
+    the Redis metrics and Server-Timing count all of them.
+    """
+
+    async def execute_command(self, *args, **options):
+        with redis_timer(str(args[0]).lower()):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        with redis_timer("pipeline"):
+            return await super().execute(raise_on_error)
+
+
+# Shared connection pool for the Redis server
+redis_pool = redis.ConnectionPool.from_url(
+    Settings.REDIS_URL, max_connections=Settings.REDIS_MAX_CONNECTIONS
+)
+redis_client = InstrumentedRedis(connection_pool=redis_pool)
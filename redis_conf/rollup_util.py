@@ -0,0 +1,188 @@
+import json
+import redis.asyncio as redis
+from datetime import datetime, timezone
+from typing import List
+
+from core.sensors import SENSORS
+from redis_conf.redis_conn import redis_client
+
+FIELDS = ("sample_count",) + tuple(
+    f"{kind}_{sensor}" for kind in ("sum", "min", "max") for sensor in SENSORS
+)
+
+# KEYS[1]: accumulator, ARGV: hour, ttl, then FIELDS of a partial aggregate.
+# Merges the partial into the open hour. A partial of a later hour closes the open
+# hour, which is returned; a partial of an earlier hour is returned as "late".
+ACCUMULATE_SCRIPT = """
+local hour = tonumber(ARGV[1])
+local stored = redis.call('HGET', KEYS[1], 'hour')
+local fields = {'sample_count',
+    'sum_temp', 'sum_soil_hum', 'sum_air_hum', 'sum_light',
+    'min_temp', 'min_soil_hum', 'min_air_hum', 'min_light',
+    'max_temp', 'max_soil_hum', 'max_air_hum', 'max_light'}
+
+if stored and tonumber(stored) > hour then
+    return {'late'}
+end
+
+if stored and tonumber(stored) == hour then
+    redis.call('HINCRBY', KEYS[1], 'sample_count', ARGV[3])
+    for i = 2, 5 do
+        redis.call('HINCRBYFLOAT', KEYS[1], fields[i], ARGV[i + 2])
+    end
+    for i = 6, 13 do
+        local current = tonumber(redis.call('HGET', KEYS[1], fields[i]))
+        local value = tonumber(ARGV[i + 2])
+        if (i <= 9 and value < current) or (i > 9 and value > current) then
+            redis.call('HSET', KEYS[1], fields[i], ARGV[i + 2])
+        end
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return {'open'}
+end
+
+local closed = nil
+if stored then
+    closed = redis.call('HGETALL', KEYS[1])
+    redis.call('DEL', KEYS[1])
+end
+
+redis.call('HSET', KEYS[1], 'hour', ARGV[1])
+for i = 1, 13 do
+    redis.call('HSET', KEYS[1], fields[i], ARGV[i + 2])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+
+if closed then
+    table.insert(closed, 1, 'closed')
+    return closed
+end
+return {'open'}
+"""
+
+# KEYS[1]: accumulator, ARGV[1]: hour. Closes the accumulator if its hour is older.
+CLOSE_SCRIPT = """
+local stored = redis.call('HGET', KEYS[1], 'hour')
+if stored and tonumber(stored) < tonumber(ARGV[1]) then
+    local closed = redis.call('HGETALL', KEYS[1])
+    redis.call('DEL', KEYS[1])
+    return closed
+end
+return {}
+"""
+
+
+# Closed rollups that could not be written, outside the hourly:* key space
+DEFERRED_KEY = "hourly_deferred"
+
+
+def get_redis_key(device_id: str):
+    return f"hourly:{device_id}"
+
+
+def rollup_row(device_id: str, hour: datetime, aggregate: dict):
+    """
+    historical_data row of one closed hour: sensor columns hold the hourly mean.
+    """
+    count = int(aggregate["sample_count"])
+    row = {"device_id": device_id, "created_at": hour, "sample_count": count}
+    for sensor in SENSORS:
+        row[sensor] = float(aggregate[f"sum_{sensor}"]) / count
+        row[f"min_{sensor}"] = float(aggregate[f"min_{sensor}"])
+        row[f"max_{sensor}"] = float(aggregate[f"max_{sensor}"])
+    return row
+
+
+def parse_closed(device_id: str, flat: list):
+    fields = {
+        key.decode() if isinstance(key, bytes) else key: value
+        for key, value in zip(flat[::2], flat[1::2])
+    }
+    hour = datetime.utcfromtimestamp(int(fields["hour"]))
+    return rollup_row(device_id, hour, fields)
+
+
+class HourlyRollups:
+    """
+    Per-device hourly accumulators (count, sum, min, max) kept in Redis and updated on
+    every reading. When a reading of a new hour arrives, the previous hour is returned
+    as one historical_data rollup row.
+    """
+
+    def __init__(self, redis_client: redis.Redis, ttl: int):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self._accumulate = redis_client.register_script(ACCUMULATE_SCRIPT)
+
+    async def add(self, partials: List[dict]) -> List[dict]:
+        """
+        Adds hourly partial aggregates (see core.ingest.aggregate_rows), all in one
+        round trip. Returns rollup rows to insert into historical_data.
+        """
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for partial in partials:
+                hour = int(partial["hour"].replace(tzinfo=timezone.utc).timestamp())
+                await self._accumulate(
+                    keys=[get_redis_key(partial["device_id"])],
+                    args=[hour, self.ttl] + [partial[field] for field in FIELDS],
+                    client=pipe,
+                )
+            results = await pipe.execute()
+
+        rollups = []
+        for partial, result in zip(partials, results):
+            state = result[0].decode() if isinstance(result[0], bytes) else result[0]
+            if state == "closed":
+                rollups.append(parse_closed(partial["device_id"], result[1:]))
+            elif state == "late":
+                # Reading of an hour that is already closed, stored as its own rollup
+                rollups.append(
+                    rollup_row(partial["device_id"], partial["hour"], partial)
+                )
+        return rollups
+
+    async def defer(self, rollups: List[dict]):
+        """
+        Keeps rollups whose insert failed for the nightly job to write.
+        """
+        await self.redis_client.rpush(
+            DEFERRED_KEY,
+            *(
+                json.dumps(dict(rollup, created_at=rollup["created_at"].isoformat()))
+                for rollup in rollups
+            ),
+        )
+
+    async def discard(self, device_id: str):
+        # Drops the open hour of a deleted device
+        await self.redis_client.delete(get_redis_key(device_id))
+
+
+def close_stale(sync_redis_client, before: datetime) -> List[dict]:
+    """
+    Closes accumulators of hours before the given one, for devices that went silent,
+    and takes the deferred rollups. Takes a synchronous client, used by the nightly job.
+    """
+    close = sync_redis_client.register_script(CLOSE_SCRIPT)
+    hour = int(before.replace(tzinfo=timezone.utc).timestamp())
+    rollups = []
+
+    for key in sync_redis_client.scan_iter(match=get_redis_key("*"), count=1000):
+        key = key.decode() if isinstance(key, bytes) else key
+        flat = close(keys=[key], args=[hour])
+        if flat:
+            rollups.append(parse_closed(key[len(get_redis_key("")) :], flat))
+
+    pipe = sync_redis_client.pipeline(transaction=True)
+    pipe.lrange(DEFERRED_KEY, 0, -1)
+    pipe.delete(DEFERRED_KEY)
+    deferred, _ = pipe.execute()
+    for entry in deferred:
+        rollup = json.loads(entry)
+        rollup["created_at"] = datetime.fromisoformat(rollup["created_at"])
+        rollups.append(rollup)
+
+    return rollups
+
+
+hourly_rollups = HourlyRollups(redis_client, ttl=2 * 24 * 3600)
@@ -0,0 +1,112 @@
+import time
+import redis.asyncio as redis
+from typing import Dict, Tuple
+
+# KEYS[1]: bucket, ARGV: capacity, refill rate per second, tokens requested, unused
+# tokens of an expired lease. Refills the bucket by elapsed time, puts the unused
+# tokens back and takes up to the requested tokens.
+# Returns the tokens granted and, when none, the seconds until one is available.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local returned = tonumber(ARGV[4])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate + returned)
+
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+
+local retry_after = 0
+if granted == 0 then
+    retry_after = (1 - tokens) / rate
+end
+return {granted, tostring(retry_after)}
+"""
+
+
+class Throttle:
+    """
+    Token buckets in Redis, updated atomically by a Lua script. Each worker leases up
+    to lease_size tokens at a time and spends them locally, so a client within its
+    budget costs one Redis round trip per lease rather than per request. A lease lasts
+    as long as the bucket takes to refill completely, so clients sending every few
+    seconds still spend it locally, and its unused tokens go back to the bucket with
+    the next lease. A denied bucket is not asked again before its Retry-After has
+    passed.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        lease_size: int,
+        max_entries: int = 100000,
+    ):
+        self.redis_client = redis_client
+        self.lease_size = lease_size
+        self.max_entries = max_entries
+        self._take = redis_client.register_script(TAKE_SCRIPT)
+        # key -> (leased tokens left, lease expiry)
+        self._leases: Dict[str, Tuple[int, float]] = {}
+        # key -> time until which the bucket is known to be empty
+        self._denied: Dict[str, float] = {}
+
+    def _get_redis_key(self, key: str):
+        return f"throttle:{key}"
+
+    async def acquire(self, key: str, capacity: int, rate: float):
+        """
+        Takes one token from the bucket. Returns 0 when allowed, otherwise the seconds
+        the client should wait.
+        """
+        now = time.monotonic()
+        if len(self._leases) + len(self._denied) > self.max_entries:
+            self._prune(now)
+
+        denied_until = self._denied.get(key)
+        if denied_until is not None:
+            if denied_until > now:
+                return denied_until - now
+            del self._denied[key]
+
+        left, expires = self._leases.get(key, (0, 0.0))
+        if left > 0 and expires > now:
+            self._leases[key] = (left - 1, expires)
+            return 0
+
+        # Never lease more than a small part of the budget to one worker
+        requested = max(1, min(self.lease_size, capacity // 10))
+        granted, retry_after = await self._take(
+            keys=[self._get_redis_key(key)],
+            args=[capacity, rate, requested, max(0, left)],
+        )
+
+        granted, retry_after = int(granted), float(retry_after)
+        if granted == 0:
+            self._leases.pop(key, None)
+            self._denied[key] = now + retry_after
+            return retry_after
+
+        # Holding leased tokens never lets the client over its budget, they are already
+        # taken from the bucket. The expiry only hands them back to other workers.
+        self._leases[key] = (granted - 1, now + capacity / rate)
+        return 0
+
+    def _prune(self, now: float):
+        # Drops expired leases and denials, keeps the local state bounded. The unused
+        # tokens of a dropped lease are lost until the bucket refills.
+        self._leases = {
+            key: lease for key, lease in self._leases.items() if lease[1] > now
+        }
+        self._denied = {
+            key: until for key, until in self._denied.items() if until > now
+        }
@@ -0,0 +1,51 @@
+import uuid
+import redis.asyncio as redis
+from typing import Iterable
+
+from redis_conf.redis_conn import redis_client
+
+
+class DeviceVersions:
+    """
+    Per-device version tokens used as ETags. Every write replaces the token with a new
+    random value, so a token never comes back even if Redis loses its keys.
+    """
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis_client = redis_client
+
+    def _get_redis_key(self, device_id: str, scope: str):
+        return f"device_version:{scope}:{device_id}"
+
+    async def get(self, device_id: str, scope: str):
+        key = self._get_redis_key(device_id, scope)
+        version = await self.redis_client.get(key)
+
+        if version is None:
+            await self.redis_client.set(key, uuid.uuid4().hex, nx=True)
+            version = await self.redis_client.get(key)
+
+        return version.decode()
+
+    async def etag(self, device_id: str, scope: str, resource: str):
+        return f'"{resource}-{await self.get(device_id, scope)}"'
+
+    async def bump(self, device_ids: Iterable[str], scope: str):
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for device_id in device_ids:
+                pipe.set(self._get_redis_key(device_id, scope), uuid.uuid4().hex)
+            await pipe.execute()
+
+
+def etag_matches(if_none_match: str, etag: str):
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+device_versions = DeviceVersions(redis_client)
@@ -1,24 +1,30 @@
 from fastapi import HTTPException, Depends, APIRouter, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
 from datetime import timedelta
-import requests
+import httpx
 import uuid
 
 from schemas.device import DeviceID, AuthorizationCode
 from models.device import Device
 from core.settings import Settings
 from core.security import create_device_token
+from core.backend_client import backend_client, CircuitOpenError
+from core.devices import device_exists
 
 from dependencies import get_db
 
 from redis_conf.redis_conn import redis_client
 from redis_conf.rate_limiting_util import RateLimiter
+from redis_conf.device_registry import device_registry
 
 rate_limiter = RateLimiter(
-    redis_client, threshold=3, reset_interval=timedelta(minutes=15)
+    redis_client,
+    threshold=3,
+    reset_interval=timedelta(minutes=15),
+    whitelist=Settings.WHITELIST_IPS,
 )
 
 router = APIRouter()
@@ -35,16 +41,13 @@ async def request_token(
     """
     ip = request.client.host
 
-    if rate_limiter.is_rate_limited(ip):
+    failed_attempts = await rate_limiter.get_failed_attempts(ip)
+    if rate_limiter.exceeds_threshold(ip, failed_attempts):
         raise HTTPException(status_code=429, detail="Too many failed attempts")
 
-    device = await db.execute(
-        select(Device).filter(Device.device_id == payload.device_id)
-    )
-    device = device.scalars().first()
-
-    if not device:
-        rate_limiter.record_failure(ip)
+    # Unknown ids are answered from the device registry, without a database query
+    if not await device_exists(db, payload.device_id):
+        await rate_limiter.record_failure(ip)
         return JSONResponse(
             content={"message": "Device not found."},
             status_code=404,
@@ -55,7 +58,8 @@ async def request_token(
         data={"sub": payload.device_id}, expires_delta=access_token_expires
     )
 
-    rate_limiter.reset_failures(ip)
+    if failed_attempts:
+        await rate_limiter.reset_failures(ip)
 
     return JSONResponse(content={"access_token": token}, status_code=200)
 
@@ -69,50 +73,43 @@ async def authorize_device(
     """
     code = payload.code
 
-    ruby_backend_url = "https://ruby-backend-api.greenmind.site/"
-
-    headers = {"Content-Type": "application/json"}
-    response_1 = requests.get(
-        ruby_backend_url + "api/v1/auth_code",
-        json={"code": code},
-        headers=headers,
-    )
+    try:
+        response_1 = await backend_client.request(
+            "GET", "api/v1/auth_code", json={"code": code}
+        )
+    except (CircuitOpenError, httpx.HTTPError):
+        raise HTTPException(status_code=503, detail="Error! Backend unavailable.")
 
     if response_1.status_code != 200:
         raise HTTPException(
             status_code=response_1.status_code, detail="Error! Invalid code."
         )
-    else:
-        while True:
-            new_device_id = str(uuid.uuid4())
-
-            existing_device = await db.execute(
-                select(Device).filter(Device.device_id == new_device_id)
-            )
-
-            existing_device = existing_device.scalars().first()
-
-            if existing_device is None:
-                new_device = Device(device_id=new_device_id)
-                db.add(new_device)
-                await db.commit()
-                break
-
-        headers = {"Content-Type": "application/json"}
-        response_2 = requests.post(
-            ruby_backend_url + "api/v1/devices",
-            json={"code": code, "uuid": new_device_id},
-            headers=headers,
+
+    # A random UUID4 does not collide in practice, the primary key guards the rest
+    new_device_id = str(uuid.uuid4())
+    try:
+        db.add(Device(device_id=new_device_id))
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Error! Something went wrong.")
+
+    await device_registry.add(new_device_id)
+
+    try:
+        response_2 = await backend_client.request(
+            "POST", "api/v1/devices", json={"code": code, "uuid": new_device_id}
+        )
+    except (CircuitOpenError, httpx.HTTPError):
+        raise HTTPException(status_code=503, detail="Error! Backend unavailable.")
+
+    if response_2.status_code != 201:
+        raise HTTPException(
+            status_code=response_2.status_code,
+            detail="Error! Something went wrong.",
         )
-        print("there")
-        print(response_2.text)
-        if response_2.status_code != 201:
-            raise HTTPException(
-                status_code=response_2.status_code,
-                detail="Error! Something went wrong.",
-            )
-        else:
-            return JSONResponse(
-                content={"message": "Device authorized!", "device_id": new_device_id},
-                status_code=200,
-            )
+
+    return JSONResponse(
+        content={"message": "Device authorized!", "device_id": new_device_id},
+        status_code=200,
+    )
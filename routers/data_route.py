@@ -1,21 +1,56 @@
-from fastapi import Depends, APIRouter, Request
-from fastapi.responses import JSONResponse
+import hashlib
+import logging
+from fastapi import Depends, APIRouter, Query, Request, Response
+from fastapi.responses import JSONResponse, ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import Load
-from sqlalchemy import desc
-from datetime import datetime
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+from typing import List, Optional, Union
 
 from models.data import Data
 from models.historical_data import HistoricalData
-from models.daily_average import DailyAverages
 
-from schemas.data import DataUpdate
+from schemas.data import (
+    DataUpdate,
+    DataReading,
+    DataRead,
+    DailyAverageRead,
+    HistoryPage,
+)
+from schemas.sensor_bounds import sensor_bounds
 
 from dependencies import get_db
 from core.security import get_device_id
+from core.settings import Settings
+from core.ingest import (
+    upsert_data,
+    aggregate_rows,
+    increment_daily_aggregates,
+)
+from core.history import (
+    MIN_RESOLUTION,
+    resolution_for,
+    bucket_start,
+    history_buckets,
+    utc_naive,
+)
+from core.queries import device_data_query, daily_history_query
+from core.write_behind import write_behind_buffer
+from core.codecs import ReadingRoute
 
-router = APIRouter()
+from redis_conf.version_util import device_versions, etag_matches
+from redis_conf.rollup_util import hourly_rollups
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=ReadingRoute)
+
+MAX_BATCH_SIZE = Settings.MAX_BATCH_SIZE
+WRITE_BEHIND_ENABLED = Settings.WRITE_BEHIND_ENABLED
+HISTORY_MAX_POINTS = Settings.HISTORY_MAX_POINTS
 
 
 # ----------------- GET REQUESTS ----------------- #
@@ -41,60 +76,121 @@ async def read_data(request: Request, db: AsyncSession = Depends(get_db)):
 '''
 
 
-@router.get("/devices/data")
+@router.get("/devices/data", response_model=List[DataRead])
 async def read_device_data(
+    request: Request,
     device_id: str = Depends(get_device_id),
     db: AsyncSession = Depends(get_db),
 ):
     """
-    Returns data for given device's id
+    Returns data for given device's id. Supports conditional requests with If-None-Match.
     """
-    result = await db.execute(
-        select(Data)
-        .filter_by(device_id=device_id)
-        .options(
-            Load(Data).load_only(Data.temp, Data.soil_hum, Data.air_hum, Data.light)
-        )
-    )
-    device_data = result.scalars().all()
+    etag = await device_versions.etag(device_id, "data", "data")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    result = await db.execute(device_data_query(device_id))
+    device_data = [dict(row) for row in result.mappings()]
 
     if not device_data:
-        return JSONResponse(content={}, status_code=404)
+        return JSONResponse(content={}, status_code=404, headers={"ETag": etag})
 
-    return device_data
+    return ORJSONResponse(content=device_data, headers={"ETag": etag})
 
 
-@router.get("/devices/data/history")
+@router.get(
+    "/devices/data/history",
+    response_model=Union[List[DailyAverageRead], HistoryPage],
+)
 async def read_device_data_history(
-    device_id: str = Depends(get_device_id), db: AsyncSession = Depends(get_db)
+    request: Request,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    resolution: Optional[int] = Query(None, ge=MIN_RESOLUTION),
+    limit: int = Query(HISTORY_MAX_POINTS, ge=1, le=HISTORY_MAX_POINTS),
+    after: Optional[datetime] = None,
+    device_id: str = Depends(get_device_id),
+    db: AsyncSession = Depends(get_db),
 ):
     """
-    Returns daily average data from last 7 days
+    Returns daily average data from last 7 days, including the current day so far.
+    With from, to or resolution (seconds) returns hourly history downsampled to at most
+    limit points per page instead, pass the returned next as after for the next page.
+    Supports conditional requests with If-None-Match.
     """
-    result = await db.execute(
-        select(DailyAverages)
-        .filter_by(device_id=device_id)
-        .order_by(desc(DailyAverages.date))
-        .options(
-            Load(DailyAverages).load_only(
-                DailyAverages.avg_temp,
-                DailyAverages.avg_soil_hum,
-                DailyAverages.avg_air_hum,
-                DailyAverages.avg_light,
-                DailyAverages.date,
+    # Each combination of parameters is its own resource, a tag never matches another page
+    params = repr((from_, to, resolution, limit, after)).encode()
+    etag = await device_versions.etag(
+        device_id, "data", f"history-{hashlib.sha1(params).hexdigest()[:16]}"
+    )
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if from_ is not None or to is not None or resolution is not None:
+        end = utc_naive(to) or datetime.utcnow()
+        start = utc_naive(from_) or end - timedelta(days=7)
+        if start >= end:
+            return JSONResponse(
+                content={"message": "from must be before to."}, status_code=422
+            )
+
+        resolution = resolution or resolution_for(start, end, limit)
+        result = await db.execute(
+            history_buckets(
+                device_id, start, end, resolution, limit, after=utc_naive(after)
             )
         )
-    )
+        points = [dict(row) for row in result.mappings()]
 
-    device_historical_data = result.scalars().all()
+        next_after = None
+        if len(points) > limit:
+            points = points[:limit]
+            next_after = bucket_start(points[-1]["bucket"])
+        for point in points:
+            point["time"] = bucket_start(point.pop("bucket"))
+
+        return ORJSONResponse(
+            content={"resolution": resolution, "points": points, "next": next_after},
+            headers={"ETag": etag},
+        )
+
+    result = await db.execute(daily_history_query(device_id))
+
+    device_historical_data = [dict(row) for row in result.mappings()]
 
     if not device_historical_data:
-        return JSONResponse(content={}, status_code=404)
+        return JSONResponse(content={}, status_code=404, headers={"ETag": etag})
 
-    return device_historical_data
+    return ORJSONResponse(content=device_historical_data, headers={"ETag": etag})
 
 
 # ----------------- POST REQUESTS ----------------- #
+async def store_rollups(db: AsyncSession, rows: List[dict]):
+    """
+    Counts committed readings into the hourly rollups and writes the hours they close.
+    Only stored readings are counted, rollups that fail to insert are deferred to the
+    nightly job (average_calc.py).
+    """
+    try:
+        rollups = await hourly_rollups.add(aggregate_rows(rows, "hour"))
+    except Exception:
+        logger.exception("Hourly rollup update failed")
+        return []
+
+    if rollups:
+        try:
+            await db.execute(insert(HistoricalData).values(rollups))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.exception("Hourly rollup insert failed")
+            try:
+                await hourly_rollups.defer(rollups)
+            except Exception:
+                logger.exception("Deferring %d hourly rollups failed", len(rollups))
+    return rollups
+
+
 @router.post("/devices/data")
 async def update_device_data(
     payload: DataUpdate,
@@ -103,56 +199,114 @@ async def update_device_data(
 ):
     """
     Updates data for a given device's id. If no data exists, creates a new data entry.
+    Besides JSON accepts MessagePack and the fixed struct format, see core/codecs.py.
     """
-    data_entry = await db.execute(select(Data).filter(Data.device_id == device_id))
+    now = datetime.utcnow()
+    row = {
+        "device_id": device_id,
+        "temp": payload.temp,
+        "soil_hum": payload.soil_hum,
+        "air_hum": payload.air_hum,
+        "light": payload.light,
+        "updated_at": now,
+    }
 
-    data_entry = data_entry.scalars().first()
+    if WRITE_BEHIND_ENABLED:
+        write_behind_buffer.put(row)
+        return JSONResponse(
+            content={"message": "Data has been updated."},
+            status_code=200,
+        )
 
-    if not data_entry:
-        try:
-            new_data_entry = Data(
-                device_id=device_id,
-                temp=payload.temp,
-                soil_hum=payload.soil_hum,
-                air_hum=payload.air_hum,
-                light=payload.light,
-            )
-            db.add(new_data_entry)
-            await db.commit()
-        except:
-            return JSONResponse(content={}, status_code=404)
-    else:
-        data_entry.soil_hum = payload.soil_hum
-        data_entry.light = payload.light
-        data_entry.temp = payload.temp
-        data_entry.air_hum = payload.air_hum
+    try:
+        await db.execute(upsert_data([row]))
+        await db.execute(increment_daily_aggregates(aggregate_rows([row])))
         await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return JSONResponse(content={}, status_code=404)
+
+    await store_rollups(db, [row])
+    await device_versions.bump([device_id], "data")
 
-    last_entry = await db.execute(
-        select(HistoricalData)
-        .filter(HistoricalData.device_id == device_id)
-        .order_by(HistoricalData.created_at.desc())
-        .limit(1)
+    return JSONResponse(
+        content={"message": "Data has been updated."},
+        status_code=200,
     )
 
-    last_entry = last_entry.scalars().first()
-
-    if (
-        not last_entry
-        or (datetime.utcnow() - last_entry.created_at).total_seconds() > 3600
-    ):
-        new_historical_data = HistoricalData(
-            device_id=device_id,
-            created_at=datetime.utcnow(),
-            temp=payload.temp,
-            soil_hum=payload.soil_hum,
-            air_hum=payload.air_hum,
-            light=payload.light,
+
+@router.post("/devices/data/batch")
+async def update_device_data_batch(
+    payload: List[DataReading],
+    device_id: str = Depends(get_device_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Stores a batch of buffered readings for a given device's id in one transaction.
+    The newest reading becomes the device's current data unless a more recent one is stored,
+    every reading goes into the hourly rollups.
+    Readings out of range are skipped and reported by index, the rest is stored.
+    Besides JSON accepts MessagePack and the fixed struct format, see core/codecs.py.
+    """
+    if not payload:
+        return JSONResponse(
+            content={"message": "No readings provided."}, status_code=422
+        )
+
+    if len(payload) > MAX_BATCH_SIZE:
+        return JSONResponse(
+            content={"message": f"Too many readings. Maximum: {MAX_BATCH_SIZE}."},
+            status_code=413,
         )
-        db.add(new_historical_data)
+
+    rejected_rows = sensor_bounds.check_many(
+        [reading.sensor_values() for reading in payload]
+    )
+    rejected = [
+        {"index": index, "errors": errors}
+        for index, errors in sorted(rejected_rows.items())
+    ]
+
+    accepted = [
+        reading for index, reading in enumerate(payload) if index not in rejected_rows
+    ]
+    if not accepted:
+        return JSONResponse(
+            content={"message": "No valid readings.", "rejected": rejected},
+            status_code=422,
+        )
+
+    now = datetime.utcnow()
+    readings = sorted(accepted, key=lambda reading: reading.timestamp or now)
+
+    rows = [
+        {
+            "device_id": device_id,
+            "updated_at": reading.timestamp or now,
+            "temp": reading.temp,
+            "soil_hum": reading.soil_hum,
+            "air_hum": reading.air_hum,
+            "light": reading.light,
+        }
+        for reading in readings
+    ]
+    try:
+        await db.execute(upsert_data([rows[-1]], only_newer=True))
+        await db.execute(increment_daily_aggregates(aggregate_rows(rows)))
         await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return JSONResponse(content={}, status_code=404)
+
+    rollups = await store_rollups(db, rows)
+    await device_versions.bump([device_id], "data")
 
     return JSONResponse(
-        content={"message": "Data has been updated."},
+        content={
+            "message": "Data has been updated.",
+            "readings": len(readings),
+            "historical_entries": len(rollups),
+            "rejected": rejected,
+        },
         status_code=200,
     )
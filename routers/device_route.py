@@ -1,49 +1,65 @@
-from fastapi import Depends, APIRouter, BackgroundTasks
+from fastapi import Depends, APIRouter
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import Load
 from sqlalchemy import delete
-import asyncio
 
 from models.task import Task
 from models.device import Device
 from models.data import Data
 from models.historical_data import HistoricalData
 from models.daily_average import DailyAverages
+from models.job import Job
 
 from dependencies import get_db
 from core.security import get_device_id
+from core.jobs import job_handler, enqueue_job, held_jobs
+from core.devices import device_exists
+
+from redis_conf.version_util import device_versions
+from redis_conf.device_registry import device_registry
+from redis_conf.rollup_util import hourly_rollups
+from redis_conf.notifier import task_notifier
 
 router = APIRouter()
 
 
-async def delete_device_information(device_id: str, db: AsyncSession):
-    while True:
-        result = await db.execute(
-            select(Task).filter(
-                Task.device_id == device_id,
-                Task.status == 0,
-                Task.task_number == 1,
-            )
-        )
-        task = result.scalars().all()
+@job_handler("delete_device")
+async def delete_device_information(db: AsyncSession, payload: dict):
+    """
+    Deletes all rows of a device in the job's transaction. delete_device queues the job
+    held, it is released once the device acknowledges that deletion task, see
+    manage_device_tasks (update).
+    """
+    device_id = payload["device_id"]
+
+    await db.execute(delete(Data).where(Data.device_id == device_id))
+    await db.execute(
+        delete(HistoricalData).where(HistoricalData.device_id == device_id)
+    )
+    await db.execute(
+        delete(DailyAverages).where(DailyAverages.device_id == device_id)
+    )
+    await db.execute(delete(Task).where(Task.device_id == device_id))
+    await db.execute(delete(Device).where(Device.device_id == device_id))
+
+    # Redis is only cleaned up once the deletion is committed, retried until it works
+    enqueue_job(db, "invalidate_device", {"device_id": device_id})
 
-        if not task:
-            await db.execute(delete(Data).where(Data.device_id == device_id))
-            await db.execute(
-                delete(HistoricalData).where(HistoricalData.device_id == device_id)
-            )
-            await db.execute(
-                delete(DailyAverages).where(DailyAverages.device_id == device_id)
-            )
-            await db.execute(delete(Task).where(Task.device_id == device_id))
-            await db.execute(delete(Device).where(Device.device_id == device_id))
 
-            await db.commit()
-            break
-        else:
-            await asyncio.sleep(5)
+@job_handler("invalidate_device")
+async def invalidate_device(db: AsyncSession, payload: dict):
+    """
+    Forgets a deleted device in Redis: the registry, its hourly rollup and its ETags.
+    The job is retried with a backoff while Redis fails.
+    """
+    device_id = payload["device_id"]
+
+    await device_registry.remove(device_id)
+    await hourly_rollups.discard(device_id)
+    await device_versions.bump([device_id], "data")
+    await device_versions.bump([device_id], "tasks")
 
 
 '''
@@ -66,32 +82,36 @@ async def read_devices(db: AsyncSession = Depends(get_db)):
 
 @router.delete("/delete_device")
 async def delete_device(
-    background_tasks: BackgroundTasks,
     device_id: str = Depends(get_device_id),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Deletes device with given device_id. Must include JWT token.
+    The device's data is removed once it acknowledges the deletion task.
     """
-    result = await db.execute(
-        select(Device)
-        .filter_by(device_id=device_id)
-        .options(Load(Device).load_only(Device.device_id))
-    )
-
-    device = result.scalars().all()
-
-    if not device:
+    if not await device_exists(db, device_id):
         return JSONResponse(content={"message": "Device not found."}, status_code=404)
     else:
         await db.execute(delete(Task).where(Task.device_id == device_id))
 
         deleting_task = Task(device_id=device_id, task_number=1, status=0)
-
         db.add(deleting_task)
+        await db.flush()
+
+        # Held until the device acknowledges this very task, see manage_device_tasks
+        await db.execute(
+            delete(Job).where(*held_jobs("delete_device", device_id=device_id))
+        )
+        enqueue_job(
+            db,
+            "delete_device",
+            {"device_id": device_id, "task_id": deleting_task.task_id},
+            held=True,
+        )
         await db.commit()
 
-        background_tasks.add_task(delete_device_information, device_id, db)
+        await device_versions.bump([device_id], "tasks")
+        await task_notifier.publish(device_id)
 
         return JSONResponse(
             content={"message": "Device deleted successfully."}, status_code=200
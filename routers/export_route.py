@@ -0,0 +1,53 @@
+from fastapi import Depends, APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Optional
+
+from dependencies import async_session
+from core.security import get_device_id
+from core.settings import Settings
+from core.export import EXPORT_FORMATS, export_query, encode_chunks, gzip_chunks
+from core.history import utc_naive
+
+router = APIRouter()
+
+EXPORT_CHUNK_SIZE = Settings.EXPORT_CHUNK_SIZE
+
+
+@router.get("/devices/data/export")
+async def export_device_data(
+    request: Request,
+    table: str = Query("history", regex="^(history|daily)$"),
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    device_id: str = Depends(get_device_id),
+):
+    """
+    Streams a device's hourly history or daily averages as NDJSON or CSV, gzipped when
+    the client accepts it. Rows are fetched EXPORT_CHUNK_SIZE at a time through a
+    server-side cursor, so memory use does not grow with the range.
+    """
+    stmt = export_query(table, device_id, utc_naive(from_), utc_naive(to))
+
+    async def chunks():
+        # The request's session is closed before the body is sent, use our own
+        async with async_session() as db:
+            result = await db.stream(
+                stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+            )
+            async for rows in result.mappings().partitions():
+                yield [dict(row) for row in rows]
+
+    body = encode_chunks(chunks(), format)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{device_id}-{table}.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        body, media_type=EXPORT_FORMATS[format], headers=headers
+    )
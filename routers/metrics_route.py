@@ -0,0 +1,12 @@
+from fastapi import Response, APIRouter
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
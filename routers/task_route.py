@@ -1,20 +1,32 @@
-from fastapi import Depends, APIRouter
-from fastapi.responses import JSONResponse
+from fastapi import Depends, APIRouter, Request, Response, Query
+from fastapi.responses import JSONResponse, ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
 from sqlalchemy.orm import Load
+from typing import List
+import asyncio
 
 from models.task import Task
-from models.device import Device
 
 from schemas.task import TaskAdd
 from schemas.task import TaskUpdate
+from schemas.task import TaskRead
 
 from dependencies import get_db
 from core.security import get_device_id
+from core.settings import Settings
+from core.jobs import release_jobs, notify_workers
+from core.devices import device_exists
+from core.queries import pending_tasks_query, device_task_query
+
+from redis_conf.version_util import device_versions, etag_matches
+from redis_conf.notifier import task_notifier
 
 router = APIRouter()
 
+MAX_TASK_WAIT_SECONDS = Settings.MAX_TASK_WAIT_SECONDS
+
 
 # ----------------- GET REQUESTS ----------------- #
 '''
@@ -43,32 +55,50 @@ async def read_tasks(db: AsyncSession = Depends(get_db)):
 '''
 
 
-@router.get("/devices/tasks")
+@router.get("/devices/tasks", response_model=List[TaskRead])
 async def read_device_tasks(
-    device_id: str = Depends(get_device_id), db: AsyncSession = Depends(get_db)
+    request: Request,
+    wait: int = Query(0, ge=0, le=MAX_TASK_WAIT_SECONDS),
+    device_id: str = Depends(get_device_id),
+    db: AsyncSession = Depends(get_db),
 ):
     """
-    Returns tasks for given device's id
+    Returns tasks for given device's id. Supports conditional requests with If-None-Match.
+    With wait, holds the request for up to that many seconds until a new task arrives.
     """
-    result = await db.execute(
-        select(Task)
-        .filter(Task.device_id == device_id, Task.status == 0)
-        .options(
-            Load(Task).load_only(
-                Task.task_id,
-                Task.task_number,
-                Task.status,
-                Task.created_at,
-                Task.updated_at,
-            )
-        )
-    )
-    tasks = result.scalars().all()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
 
-    if not tasks:
-        return JSONResponse(content={}, status_code=404)
+    with task_notifier.subscribe(device_id) as notified:
+        while True:
+            notified.clear()
+
+            etag = await device_versions.etag(device_id, "tasks", "tasks")
+            not_modified = etag_matches(request.headers.get("if-none-match"), etag)
+
+            if not not_modified:
+                result = await db.execute(pending_tasks_query(device_id))
+                tasks = [dict(row) for row in result.mappings()]
+
+                if tasks:
+                    return ORJSONResponse(content=tasks, headers={"ETag": etag})
+
+                # Give the pooled connection back while waiting
+                await db.rollback()
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
 
-    return tasks
+            try:
+                await asyncio.wait_for(notified.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+    if not_modified:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return JSONResponse(content={}, status_code=404, headers={"ETag": etag})
 
 
 # ----------------- POST REQUESTS ----------------- #
@@ -81,12 +111,7 @@ async def manage_device_tasks(
     """
     Adds new task for given device_id
     """
-    result = await db.execute(
-        select(Device).options(Load(Device).load_only(Device.device_id))
-    )
-    device = result.scalars().all()
-
-    if not device:
+    if not await device_exists(db, device_id):
         return JSONResponse(content={}, status_code=404)
     else:
         new_task = Task(
@@ -95,10 +120,18 @@ async def manage_device_tasks(
             status=task_info.status,
         )
 
-        db.add(new_task)
-        await db.commit()
+        # The device may have been deleted since device_exists() saw it
+        try:
+            db.add(new_task)
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return JSONResponse(content={}, status_code=404)
         await db.refresh(new_task)
 
+        await device_versions.bump([device_id], "tasks")
+        await task_notifier.publish(device_id)
+
         return JSONResponse(
             content={"message": "Task added successfully", "task_id": new_task.task_id},
             status_code=200,
@@ -114,15 +147,7 @@ async def manage_device_tasks(
     """
     Updates the status of a task with the given task_id
     """
-    result = await db.execute(
-        select(Task)
-        .filter(Task.device_id == device_id, Task.task_id == task_info.task_id)
-        .options(
-            Load(Task).load_only(
-                Task.task_id, Task.task_number, Task.status, Task.device_id
-            )
-        )
-    )
+    result = await db.execute(device_task_query(device_id, task_info.task_id))
 
     task = result.scalars().first()
 
@@ -134,8 +159,22 @@ async def manage_device_tasks(
         )
     else:
         task.status = task_info.status
+
+        # Acknowledged deletion task of delete_device, the job worker removes the data.
+        # Tasks added through /devices/tasks/add have no held job and delete nothing.
+        released = 0
+        if task.task_number == 1 and task_info.status != 0:
+            released = await release_jobs(
+                db, "delete_device", device_id=device_id, task_id=task.task_id
+            )
+
         await db.commit()
 
+        await device_versions.bump([device_id], "tasks")
+        await task_notifier.publish(device_id)
+        if released:
+            await notify_workers()
+
         return JSONResponse(
             content={
                 "message": "Task status updated successfully",
@@ -1,36 +1,90 @@
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, validator, root_validator
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
 
+from core.sensors import SENSORS
+from schemas.sensor_bounds import sensor_bounds
 
-class DataUpdate(BaseModel):
+
+class SensorValues(BaseModel):
     temp: float
     soil_hum: float
     air_hum: float
     light: float
 
-    @validator("temp")
-    def validate_temp(cls, temp):
-        if temp < -10.0 or temp > 100.0:
-            raise ValueError(
-                "Invalid temperature value. Allowed range: -10.0 to 100.0."
-            )
-        return temp
-
-    @validator("soil_hum")
-    def validate_soil_hum(cls, soil_hum):
-        if soil_hum < 0.0 or soil_hum > 66000.0:
-            raise ValueError(
-                "Invalid soil humidity value. Allowed range: 0.0 to 66000.0."
-            )
-        return soil_hum
-
-    @validator("air_hum")
-    def validate_air_hum(cls, air_hum):
-        if air_hum < 0 or air_hum > 100:
-            raise ValueError("Invalid air humidity value. Allowed range: 0 to 100.")
-        return air_hum
-
-    @validator("light")
-    def validate_light(cls, light):
-        if light < 0.0 or light > 51000.0:
-            raise ValueError("Invalid light value. Allowed range: 0.0 to 51000.0.")
-        return light
+    def sensor_values(self):
+        return (self.temp, self.soil_hum, self.air_hum, self.light)
+
+
+class DataUpdate(SensorValues):
+    @root_validator(skip_on_failure=True)
+    def validate_ranges(cls, values):
+        errors = sensor_bounds.check(tuple(values[sensor] for sensor in SENSORS))
+        if errors:
+            raise ValueError(" ".join(errors))
+        return values
+
+
+class DataReading(SensorValues):
+    """
+    Reading of a batch, its ranges are checked for the whole batch at once.
+    """
+
+    timestamp: Optional[datetime] = None
+
+    @validator("timestamp")
+    def validate_timestamp(cls, timestamp):
+        if timestamp is None:
+            return timestamp
+
+        # Stored timestamps are naive UTC, like the rest of the models
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+        if timestamp > datetime.utcnow() + timedelta(minutes=5):
+            raise ValueError("Invalid timestamp value. Timestamp is in the future.")
+        return timestamp
+
+
+class DataRead(BaseModel):
+    data_id: int
+    temp: Optional[float]
+    soil_hum: Optional[float]
+    air_hum: Optional[float]
+    light: Optional[float]
+
+
+class DailyAverageRead(BaseModel):
+    daily_averages_id: int
+    avg_temp: Optional[float]
+    avg_soil_hum: Optional[float]
+    avg_air_hum: Optional[float]
+    avg_light: Optional[float]
+    date: date
+
+
+class HistoryPoint(BaseModel):
+    time: datetime
+    sample_count: int
+    avg_temp: Optional[float]
+    min_temp: Optional[float]
+    max_temp: Optional[float]
+    avg_soil_hum: Optional[float]
+    min_soil_hum: Optional[float]
+    max_soil_hum: Optional[float]
+    avg_air_hum: Optional[float]
+    min_air_hum: Optional[float]
+    max_air_hum: Optional[float]
+    avg_light: Optional[float]
+    min_light: Optional[float]
+    max_light: Optional[float]
+
+
+class HistoryPage(BaseModel):
+    """
+    Downsampled history, next is the cursor of the following page or None.
+    """
+
+    resolution: int
+    points: List[HistoryPoint]
+    next: Optional[datetime]
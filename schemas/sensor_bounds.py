@@ -0,0 +1,90 @@
+import json
+from typing import Dict, List, Sequence
+
+from core.settings import Settings
+from core.metrics import SENSOR_REJECTIONS
+from core.sensors import SENSORS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SENSOR_LABELS = {
+    "temp": "temperature",
+    "soil_hum": "soil humidity",
+    "air_hum": "air humidity",
+    "light": "light",
+}
+
+# Allowed (low, high) per sensor, SENSOR_BOUNDS overrides them
+DEFAULT_BOUNDS = {
+    "temp": (-10.0, 100.0),
+    "soil_hum": (0.0, 66000.0),
+    "air_hum": (0.0, 100.0),
+    "light": (0.0, 51000.0),
+}
+
+
+class SensorBounds:
+    """
+    Bounds of all sensors compiled once into parallel tuples (and arrays when NumPy is
+    available) so a reading, or a whole batch, is checked in one pass.
+    """
+
+    def __init__(self, bounds: Dict[str, Sequence[float]]):
+        self.low = tuple(float(bounds[sensor][0]) for sensor in SENSORS)
+        self.high = tuple(float(bounds[sensor][1]) for sensor in SENSORS)
+        self.messages = tuple(
+            f"Invalid {SENSOR_LABELS[sensor]} value. "
+            f"Allowed range: {low} to {high}."
+            for sensor, low, high in zip(SENSORS, self.low, self.high)
+        )
+        if np is not None:
+            self.low_array = np.array(self.low)
+            self.high_array = np.array(self.high)
+
+    def check(self, values: Sequence[float]) -> List[str]:
+        """
+        Returns error messages of one reading ordered like SENSORS, empty when valid.
+        """
+        if all(
+            low <= value <= high
+            for value, low, high in zip(values, self.low, self.high)
+        ):
+            return []
+
+        errors = []
+        for index, value in enumerate(values):
+            if not self.low[index] <= value <= self.high[index]:
+                SENSOR_REJECTIONS.labels(SENSORS[index]).inc()
+                errors.append(self.messages[index])
+        return errors
+
+    def check_many(self, rows: Sequence[Sequence[float]]) -> Dict[int, List[str]]:
+        """
+        Checks many readings at once. Returns error messages by row index, only for
+        rejected rows, so valid rows can still be stored.
+        """
+        if np is None:
+            errors = {index: self.check(row) for index, row in enumerate(rows)}
+            return {index: messages for index, messages in errors.items() if messages}
+
+        matrix = np.asarray(rows, dtype=float).reshape(-1, len(SENSORS))
+        # NaN fails both comparisons, so it is rejected as well
+        invalid = ~((matrix >= self.low_array) & (matrix <= self.high_array))
+
+        for index, count in enumerate(invalid.sum(axis=0)):
+            if count:
+                SENSOR_REJECTIONS.labels(SENSORS[index]).inc(int(count))
+
+        return {
+            int(row): [self.messages[i] for i in np.flatnonzero(invalid[row])]
+            for row in np.flatnonzero(invalid.any(axis=1))
+        }
+
+
+# Devices have no model column, so one set of bounds applies to every device
+sensor_bounds = SensorBounds(
+    dict(DEFAULT_BOUNDS, **json.loads(Settings.SENSOR_BOUNDS or "{}"))
+)
@@ -1,4 +1,6 @@
 from pydantic import BaseModel, validator
+from datetime import datetime
+from typing import Optional
 
 
 class TaskAdd(BaseModel):
@@ -27,3 +29,11 @@ class TaskUpdate(BaseModel):
         if status not in [0, 1, 2]:
             raise ValueError("Invalid status value. Allowed values: 0, 1, 2.")
         return status
+
+
+class TaskRead(BaseModel):
+    task_id: int
+    task_number: int
+    status: int
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
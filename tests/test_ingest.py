@@ -0,0 +1,68 @@
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from core.ingest import aggregate_rows, merge_aggregate, new_aggregate
+
+
+def reading(device_id, updated_at, temp, soil_hum=1.0, air_hum=2.0, light=3.0):
+    return {
+        "device_id": device_id,
+        "updated_at": updated_at,
+        "temp": temp,
+        "soil_hum": soil_hum,
+        "air_hum": air_hum,
+        "light": light,
+    }
+
+
+def test_aggregate_rows_per_day():
+    rows = [
+        reading("a", datetime(2026, 10, 18, 9, 15), 20.0),
+        reading("a", datetime(2026, 10, 18, 23, 59), 24.0),
+        reading("a", datetime(2026, 10, 19, 0, 1), 10.0),
+        reading("b", datetime(2026, 10, 18, 12, 0), 30.0),
+    ]
+
+    aggregates = aggregate_rows(rows)
+
+    assert [(a["device_id"], a["date"], a["sample_count"]) for a in aggregates] == [
+        ("a", date(2026, 10, 18), 2),
+        ("a", date(2026, 10, 19), 1),
+        ("b", date(2026, 10, 18), 1),
+    ]
+    first = aggregates[0]
+    assert first["sum_temp"] == 44.0
+    assert first["min_temp"] == 20.0
+    assert first["max_temp"] == 24.0
+
+
+def test_aggregate_rows_per_hour():
+    rows = [
+        reading("a", datetime(2026, 10, 18, 9, 0, 5), 20.0),
+        reading("a", datetime(2026, 10, 18, 9, 59, 59), 22.0),
+        reading("a", datetime(2026, 10, 18, 10, 0), 30.0),
+    ]
+
+    aggregates = aggregate_rows(rows, "hour")
+
+    assert [(a["hour"], a["sample_count"]) for a in aggregates] == [
+        (datetime(2026, 10, 18, 9), 2),
+        (datetime(2026, 10, 18, 10), 1),
+    ]
+    assert aggregates[0]["sum_temp"] == 42.0
+
+
+def test_merge_aggregate():
+    aggregate = new_aggregate(reading("a", datetime(2026, 10, 18, 9), 20.0, light=5.0))
+    other = new_aggregate(reading("a", datetime(2026, 10, 18, 10), 25.0, light=1.0))
+
+    merged = merge_aggregate(aggregate, other)
+
+    assert merged is aggregate
+    assert merged["sample_count"] == 2
+    assert merged["sum_temp"] == 45.0
+    assert (merged["min_temp"], merged["max_temp"]) == (20.0, 25.0)
+    assert (merged["min_light"], merged["max_light"]) == (1.0, 5.0)
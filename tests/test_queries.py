@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic")
+
+from core.history import history_buckets
+from core.queries import device_data_query, daily_history_query, pending_tasks_query
+from schemas.data import DataRead, DailyAverageRead, HistoryPoint
+from schemas.task import TaskRead
+
+# The routes return these rows as they are, so the columns must match the
+# response_model of the route or the documented schema drifts from the output
+
+
+def column_names(stmt):
+    return [column.name for column in stmt.selected_columns]
+
+
+@pytest.mark.parametrize(
+    "stmt, model",
+    [
+        (device_data_query("device"), DataRead),
+        (daily_history_query("device"), DailyAverageRead),
+        (pending_tasks_query("device"), TaskRead),
+    ],
+)
+def test_columns_match_response_model(stmt, model):
+    assert column_names(stmt) == list(model.__fields__)
+
+
+def test_history_buckets_match_history_point():
+    stmt = history_buckets(
+        "device", datetime(2026, 1, 1), datetime(2026, 1, 2), 3600, 100
+    )
+
+    # The route turns bucket into time
+    columns = ["time" if name == "bucket" else name for name in column_names(stmt)]
+    assert columns == list(HistoryPoint.__fields__)